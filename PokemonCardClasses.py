@@ -2,10 +2,43 @@
 ### Description: Defines four custom object classes used for storing information about a card in the
 ### Pokemon Trading Card Game.
 import re
+import sys
+
+
+## The classes use __slots__ to keep the thousands of card objects small.  Pickles are written with
+## a plain attribute dict as their state (so they still load with older versions of these classes),
+## and either that or the (None, slots) form is accepted when loading.  Strings are interned on the
+## way in, so the names, energy codes and texts repeated across reprints are only stored once.
+def _intern(value):
+    value_type = type(value)
+    if value_type is str:
+        return sys.intern(value)
+    if value_type is list:
+        for n, item in enumerate(value):
+            value[n] = _intern(item)
+        return value
+    if value_type is dict and value:
+        return {_intern(key):_intern(item) for key, item in value.items()}
+    return value
+
+def _get_slot_state(card_object):
+    return {slot:getattr(card_object, slot) for slot in card_object.__slots__}
+
+def _set_slot_state(card_object, state):
+    if isinstance(state, tuple):
+        state = dict(state[0] or {}, **(state[1] or {}))
+    if len(state) < len(card_object.__slots__):
+        card_object.__init__()
+    for attribute, value in state.items():
+        setattr(card_object, attribute, _intern(value))
+
 
-### Class intended to be used for Pokemon Cards
 class PokemonCard():
     
+    __slots__ = ("name", "traits", "HP", "type", "abilities", "attacks", "weaknesses", "resistances", "retreat_cost")
+    __getstate__ = _get_slot_state
+    __setstate__ = _set_slot_state
+    
     def __init__(self):
         self.name = str()
         self.traits = []
@@ -72,6 +105,10 @@ class PokemonCard():
 ### object is intended to hold all of the information.
 class PokemonCardAttack():
     
+    __slots__ = ("attack_name", "energy_cost", "base_damage", "description")
+    __getstate__ = _get_slot_state
+    __setstate__ = _set_slot_state
+    
     def __init__(self):
         self.attack_name = str()
         self.energy_cost = []
@@ -93,6 +130,10 @@ class PokemonCardAttack():
 ### Class to be used for Energy Cards
 class EnergyCard():
     
+    __slots__ = ("name", "basic", "description")
+    __getstate__ = _get_slot_state
+    __setstate__ = _set_slot_state
+    
     def __init__(self):
         self.name = str()
         self.basic = True
@@ -109,6 +150,10 @@ class EnergyCard():
 ### Class to be used for Trainer cards (all variants)
 class TrainerCard():
     
+    __slots__ = ("name", "subtype", "description")
+    __getstate__ = _get_slot_state
+    __setstate__ = _set_slot_state
+    
     def __init__(self):
         self.name = str()
         self.subtype = str()
@@ -116,4 +161,23 @@ class TrainerCard():
     
     def __repr__(self):
         output = "TRAINER CARD: {0}\n  {1}".format(self.name, self.description)
-        return output
\ No newline at end of file
+        return output
+
+
+### Function description: makes reprinted attacks share one PokemonCardAttack object (and one
+### energy cost list) across the whole card list, and interns the strings of every card.  Changes
+### the card list in place and returns it.  The shared attacks must be treated as read-only:
+### editing one changes it on every card that has it.
+def compact_card_list(full_card_list):
+    shared_attacks = {}
+    for expansion in full_card_list:
+        for card in expansion:
+            _set_slot_state(card, _get_slot_state(card))
+            if type(card).__name__ == "PokemonCard":
+                for n, attack in enumerate(card.attacks):
+                    key = (attack.attack_name, tuple(attack.energy_cost), attack.base_damage, attack.description)
+                    if key not in shared_attacks:
+                        _set_slot_state(attack, _get_slot_state(attack))
+                        shared_attacks[key] = attack
+                    card.attacks[n] = shared_attacks[key]
+    return full_card_list
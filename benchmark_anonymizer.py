@@ -0,0 +1,47 @@
+### Description: compares the old species anonymization at the end of readNwrite.py (one
+### str.replace pass over the whole corpus per species) with NameAnonymizer's single pass, on
+### card_texts.csv (written by readNwrite.py).
+###
+### Usage: python benchmark_anonymizer.py [card texts file]
+
+from nameAnonymizer import load_species_anonymizer
+import sys
+import time
+
+
+def old_anonymize(card_texts, pokemon_species):
+    for mon in pokemon_species:
+        card_texts = [text.replace(mon, "othermon") for text in card_texts]
+    return card_texts
+
+
+if __name__ == "__main__":
+    texts_file = sys.argv[1] if len(sys.argv) > 1 else "card_texts.csv"
+    with open(texts_file, "r") as file:
+        card_texts = file.readlines()
+    with open("pokemon_species.txt") as file:
+        pokemon_species = [species.strip() for species in file]
+    print("{0} lines, {1:.1f} MB, {2} species\n".format(len(card_texts), sum(map(len, card_texts)) / 1024**2, len(pokemon_species)))
+
+    start_time = time.perf_counter()
+    old_output = old_anonymize(card_texts, pokemon_species)
+    old_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    anonymizer = load_species_anonymizer()
+    new_output = anonymizer.anonymize_lines(card_texts)
+    new_time = time.perf_counter() - start_time
+
+    print("one pass per species: {0:.3f} s".format(old_time))
+    print("NameAnonymizer:       {0:.3f} s (including compiling the pattern)".format(new_time))
+    print("speedup: {0:.1f}x".format(old_time / new_time))
+
+    ## Lines can differ where the species order made the old loop replace a shorter name inside a
+    ## longer one first, e.g. "Porygon2" -> "othermon2"
+    differences = [(old, new) for old, new in zip(old_output, new_output) if not old == new]
+    print("\n{0} lines differ from the old output".format(len(differences)))
+    for old, new in differences[:5]:
+        for old_word, new_word in zip(old.split(), new.split()):
+            if not old_word == new_word:
+                print("  old: {0!r}  new: {1!r}".format(old_word, new_word))
+                break
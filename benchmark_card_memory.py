@@ -0,0 +1,78 @@
+### Description: measures how much memory the whole card list takes once loaded, for three
+### layouts: the old dict-backed card objects, the current __slots__ objects with interned strings,
+### and the same after compact_card_list() shares reprinted attacks.  Each layout is loaded in its
+### own process so that the peak RSS figures do not mix.
+###
+### Usage: python benchmark_card_memory.py [pickle file]
+
+from PokemonCardClasses import *
+import gc
+import pickle
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+
+LAYOUTS = ("dict", "slots", "compact")
+
+
+### Dict-backed stand-ins with the same names, used to load the pickle the way it was loaded before
+### the card classes got __slots__
+class LegacyCard():
+    pass
+
+LEGACY_CLASSES = {name:type(name, (LegacyCard,), {}) for name in ("PokemonCard", "PokemonCardAttack", "EnergyCard", "TrainerCard")}
+
+class LegacyUnpickler(pickle.Unpickler):
+    def find_class(self, module, name):
+        if module == "PokemonCardClasses":
+            return LEGACY_CLASSES[name]
+        return pickle.Unpickler.find_class(self, module, name)
+
+
+def load_layout(layout, pickle_path):
+    with open(pickle_path, "rb") as file:
+        if layout == "dict":
+            return LegacyUnpickler(file).load()
+        full_card_list = pickle.load(file)
+    if layout == "compact":
+        compact_card_list(full_card_list)
+    return full_card_list
+
+
+### Function description: loads one layout in this process and prints its measurements as a line
+### of tab-separated numbers.  With trace=True the bytes allocated for the card list are counted
+### by tracemalloc; otherwise the load is timed and the peak RSS taken, without tracing overhead.
+def measure(layout, pickle_path, trace):
+    if trace:
+        tracemalloc.start()
+    start_time = time.perf_counter()
+    full_card_list = load_layout(layout, pickle_path)
+    load_time = time.perf_counter() - start_time
+    gc.collect()
+    traced_bytes = tracemalloc.get_traced_memory()[0] if trace else 0
+    card_count = sum(len(expansion) for expansion in full_card_list)
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+    print("{0}\t{1}\t{2}\t{3}".format(card_count, traced_bytes, rss, load_time))
+
+
+def run_measurement(layout, pickle_path, mode):
+    output = subprocess.run([sys.executable, __file__, "--measure", layout, pickle_path, mode],
+                            capture_output=True, text=True, check=True).stdout
+    card_count, traced_bytes, rss, load_time = output.split()
+    return int(card_count), int(traced_bytes), int(rss), float(load_time)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2 and sys.argv[1] == "--measure":
+        measure(sys.argv[2], sys.argv[3], sys.argv[4] == "trace")
+        sys.exit(0)
+
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    print("{0:<8} {1:>8} {2:>14} {3:>14} {4:>12} {5:>10}".format("LAYOUT", "CARDS", "TOTAL (MB)", "BYTES/CARD", "PEAK RSS", "LOAD (S)"))
+    for layout in LAYOUTS:
+        card_count, traced_bytes, _, _ = run_measurement(layout, pickle_path, "trace")
+        _, _, rss, load_time = run_measurement(layout, pickle_path, "rss")
+        print("{0:<8} {1:>8} {2:>14.2f} {3:>14.0f} {4:>9.1f} MB {5:>10.3f}".format(
+            layout, card_count, traced_bytes / 1024**2, traced_bytes / card_count, rss / 1024**2, load_time))
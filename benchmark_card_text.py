@@ -0,0 +1,69 @@
+### Description: microbenchmark for html_to_card_text() against the old approach (one re.sub per
+### energy image, then a separate tag-stripping pass).  Every attack, ability, trainer and energy
+### description in full_card_list_file is turned back into an HTML fragment, with energy symbols
+### as <img> tags, and both converters are timed on the same fragments.
+
+from webscrapeFunctions import *
+from card_rip_test import IMAGE_DICT
+from bs4 import BeautifulSoup
+import pickle
+import re
+import time
+
+## Standalone energy letters in the card text, e.g. the "R" in "Discard a R Energy"
+ENERGY_LETTER = re.compile(r"(?<![\w'-])([CKDEYFRGMPW])(?![\w'-])")
+ENERGY_IMAGES = {}
+for source, letter in IMAGE_DICT.items():
+    if source.startswith("/card/image/") and len(letter) == 1:
+        ENERGY_IMAGES.setdefault(letter, source)
+
+
+### Function description: the conversion as done before html_to_card_text() existed
+def old_card_text(tag, energy_dict):
+    energy = energy_as_strings(tag, energy_dict)
+    description_text = str(tag)
+    for n in range(len(energy)):
+        description_text = re.sub("<img.*?>", energy[n], description_text, count = 1)
+    return re.sub("<.*?>", "", description_text)
+
+
+def new_card_text(tag, energy_dict):
+    return html_to_card_text(str(tag), energy_dict)
+
+
+def card_descriptions(full_card_list):
+    for expansion in full_card_list:
+        for card in expansion:
+            if type(card).__name__ == "PokemonCard":
+                yield from card.abilities.values()
+                for attack in card.attacks:
+                    yield attack.description
+            else:
+                yield card.description
+
+
+def time_converter(converter, tags):
+    start_time = time.perf_counter()
+    output = [converter(tag, IMAGE_DICT) for tag in tags]
+    return output, time.perf_counter() - start_time
+
+
+if __name__ == "__main__":
+    with open("full_card_list_file", "rb") as file:
+        full_card_list = pickle.load(file)
+
+    fragments = []
+    for description in card_descriptions(full_card_list):
+        if description:
+            html = ENERGY_LETTER.sub(lambda match: '<img src="{0}"/>'.format(ENERGY_IMAGES[match.group(1)]), description)
+            fragments.append("<p>" + html.replace("&", "&amp;") + "</p>")
+    tags = [BeautifulSoup(fragment, "lxml").p for fragment in fragments]
+    image_count = sum(fragment.count("<img") for fragment in fragments)
+    print("{0} descriptions, {1} energy images\n".format(len(tags), image_count))
+
+    old_output, old_time = time_converter(old_card_text, tags)
+    new_output, new_time = time_converter(new_card_text, tags)
+    print("re.sub per image:    {0:.3f} s ({1:.1f} us per description)".format(old_time, 1e6 * old_time / len(tags)))
+    print("html_to_card_text(): {0:.3f} s ({1:.1f} us per description)".format(new_time, 1e6 * new_time / len(tags)))
+    print("speedup: {0:.1f}x".format(old_time / new_time))
+    print("outputs identical: {0}".format(old_output == new_output))
@@ -0,0 +1,55 @@
+### Description: compares the multi-pass attack text normalization text_analysis.py used to do
+### (one re.sub list comprehension per rule, then one str.replace pass per Special Condition) with
+### the single-pass, memoized normalizers in textNormalizer.py, on the lower-cased attack
+### descriptions, and checks both give the same text.
+###
+### Usage: python benchmark_normalizer.py [repeats]
+
+from textNormalizer import *
+from cardStream import open_card_list
+import re
+import sys
+import time
+
+
+def multi_pass_part1(attack_text):
+    attack_text_2 = [re.sub("[0-9]{1,2}0 damage|[1-9] damage counter(s)?", "_AMOUNT_ damage", attack) for attack in attack_text]
+    attack_text_2 = [re.sub("( _AMOUNT_ damage plus)? [0-9]{1,2}0 more damage", " _AMOUNT_ more damage", attack) for attack in attack_text_2]
+    attack_text_2 = [re.sub("flip [a1-9] coin(s)?", "flip _N_ coins", attack) for attack in attack_text_2]
+    for status in SPECIAL_CONDITIONS:
+        attack_text_2 = [attack.replace(status, "_STATUS_") for attack in attack_text_2]
+    return attack_text_2
+
+def multi_pass_part2(attack_text):
+    descriptions = []
+    for description in attack_text:
+        description = re.sub("[0-9]{1,2}0 damage|[1-9] damage counter(s)?", "_AMOUNT_ damage", description)
+        description = re.sub("[0-9]{1,2}0 more damage", "_AMOUNT_ more damage", description)
+        description = re.sub("flip [a1-9] coin(s)?", "flip _N_ coins", description)
+        descriptions.append(description)
+    return descriptions
+
+
+def time_call(function, repeats):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start_time) / repeats, result
+
+
+if __name__ == "__main__":
+    repeats = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    attack_text = [attack.description.lower() for expansion_id, card in open_card_list().iter_cards("PokemonCard")
+                   for attack in card.attacks]
+    print("{0} attack descriptions, {1} distinct\n".format(len(attack_text), len(set(attack_text))))
+
+    for part, multi_pass, make_normalizer in (("Part 1", multi_pass_part1, attack_text_normalizer),
+                                              ("Part 2", multi_pass_part2, attack_name_normalizer)):
+        old_time, old_result = time_call(lambda: multi_pass(attack_text), repeats)
+        ## A fresh normalizer each time, so the memo only helps within a run, as in text_analysis.py
+        new_time, new_result = time_call(lambda: [normalizer.normalize(text) for normalizer in [make_normalizer()]
+                                                  for text in attack_text], repeats)
+        if not old_result == new_result:
+            sys.exit(part + ": the normalizer and the multi-pass code disagree")
+        print("{0}: multi-pass {1:.1f} ms, single pass {2:.1f} ms ({3:.1f}x)".format(
+            part, 1000 * old_time, 1000 * new_time, old_time / new_time))
@@ -0,0 +1,74 @@
+### Description: compares the card page parser backends (see parse_card_page() in
+### webscrapeFunctions.py) on pages recorded in a response cache directory or a page archive,
+### reporting parse time and peak memory per page and checking that every backend produces the
+### same cards.
+###
+### Usage: python benchmark_parser.py [cache directory or archive file]
+
+from webscrapeFunctions import *
+from webscrapeCache import ResponseCache
+from card_rip_test import IMAGE_DICT
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+
+CARD_PAGE_URL = re.compile(r"/card/[^/]+/[0-9]+\.shtml$")
+
+
+### Function description: returns the bodies of all recorded card pages in a cache directory or
+### page archive file
+def load_recorded_pages(cache_dir):
+    if os.path.isfile(cache_dir):
+        return [html for url, html in PageArchive(cache_dir).items() if CARD_PAGE_URL.search(url)]
+    cache = ResponseCache(cache_dir, offline=True)
+    pages = []
+    for entry in cache.entries():
+        if CARD_PAGE_URL.search(entry["url"]):
+            pages.append(cache.read_body(entry))
+    return pages
+
+
+### Function description: parses every page with one backend; returns the cards plus the parse
+### times and peak traced memory for each page
+def run_backend(backend, pages, pokemon_species):
+    cards, times, peaks = [], [], []
+    for html in pages:
+        tracemalloc.start()
+        start_time = time.perf_counter()
+        card = card_from_html(html, IMAGE_DICT, pokemon_species, backend)
+        times.append(time.perf_counter() - start_time)
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+        cards.append(card)
+    return cards, times, peaks
+
+
+if __name__ == "__main__":
+    cache_dir = sys.argv[1] if len(sys.argv) > 1 else "serebii_cache"
+    pages = load_recorded_pages(cache_dir)
+    if not pages:
+        sys.exit("No recorded card pages found in " + cache_dir)
+    with open("pokemon_species.txt") as file:
+        pokemon_species = frozenset(line.strip("\n") for line in file)
+
+    print("{0} recorded card pages ({1:.1f} KB on average)\n".format(len(pages), sum(map(len, pages)) / len(pages) / 1024))
+    results = {}
+    for backend in PARSER_BACKENDS:
+        cards, times, peaks = run_backend(backend, pages, pokemon_species)
+        results[backend] = [repr(card) for card in cards]
+        print("BACKEND: " + backend)
+        print("  parse time per page: mean {0:.2f} ms, median {1:.2f} ms, total {2:.2f} s".format(
+            1000 * statistics.mean(times), 1000 * statistics.median(times), sum(times)))
+        print("  peak memory per page: mean {0:.0f} KB, max {1:.0f} KB".format(
+            statistics.mean(peaks) / 1024, max(peaks) / 1024))
+
+    print("")
+    reference = results["full"]
+    for backend, output in results.items():
+        if backend == "full":
+            continue
+        mismatches = sum(1 for a, b in zip(reference, output) if not a == b)
+        print("{0} cards differ between full and {1}".format(mismatches, backend))
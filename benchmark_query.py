@@ -0,0 +1,51 @@
+### Description: times a set of typical card queries answered by CardIndex against the same
+### queries done as full scans of the card list (cardQuery.scan), and checks both give the same
+### cards in the same order.
+###
+### Usage: python benchmark_query.py [pickle file] [repeats]
+
+from cardQuery import *
+import pickle
+import sys
+import time
+
+QUERIES = [{"type":"R", "hp_min":100},
+           {"attack_cost":["C", "C", "C"]},
+           {"weak_to":"W"},
+           {"trait":"Pokémon-EX", "retreat_cost":0},
+           {"hp_min":60, "hp_max":80, "type":"G", "resistant_to":"F"},
+           {"attack_name":"Thunderbolt"},
+           {"name":"Pikachu", "expansion_id":0},
+           {"card_class":"TrainerCard"}]
+
+
+def time_call(function, repeats):
+    start_time = time.perf_counter()
+    for _ in range(repeats):
+        result = function()
+    return (time.perf_counter() - start_time) / repeats, result
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+
+    start_time = time.perf_counter()
+    index = CardIndex(full_card_list)
+    print("{0}, built in {1:.1f} ms\n".format(index, 1000 * (time.perf_counter() - start_time)))
+
+    print("{0:<60} {1:>6} {2:>11} {3:>11} {4:>8}".format("QUERY", "CARDS", "SCAN (MS)", "INDEX (MS)", "SPEEDUP"))
+    total_scan, total_index = 0, 0
+    for criteria in QUERIES:
+        scan_time, scan_result = time_call(lambda: scan(full_card_list, **criteria), repeats)
+        index_time, index_result = time_call(lambda: index.query(**criteria), repeats)
+        if not [(expansion_id, id(card)) for expansion_id, card in scan_result] == \
+               [(expansion_id, id(card)) for expansion_id, card in index_result]:
+            sys.exit("Index and scan disagree on " + str(criteria))
+        total_scan += scan_time
+        total_index += index_time
+        print("{0:<60} {1:>6} {2:>11.3f} {3:>11.3f} {4:>7.0f}x".format(
+            str(criteria), len(index_result), 1000 * scan_time, 1000 * index_time, scan_time / index_time))
+    print("\nall queries: scan {0:.2f} ms, index {1:.2f} ms".format(1000 * total_scan, 1000 * total_index))
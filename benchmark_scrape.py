@@ -0,0 +1,54 @@
+### Description: runs the card_rip_test.py flow against a recorded page archive (see
+### webscrapeArchive.py; record one with RECORD_ARCHIVE=<file> python card_rip_test.py) and reports
+### scraper throughput, so changes to webscrapeFunctions.py can be measured offline.  The
+### CONCURRENCY, PARSE_WORKERS and PARSER_BACKEND settings are read the same way as in
+### card_rip_test.py.
+###
+### Usage: python benchmark_scrape.py <archive file>
+
+from card_rip_test import *
+from benchmark_parser import CARD_PAGE_URL
+import contextlib
+import resource
+import sys
+import time
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python benchmark_scrape.py <archive file>")
+    archive = enable_replay(sys.argv[1])
+    print(archive)
+    webscrapeFunctions.PARSER_BACKEND = PARSER_BACKEND
+    with open("pokemon_species.txt") as file:
+        pokemon_species = frozenset(line.strip("\n") for line in file)
+
+    ## The full rip, with the per-card progress output thrown away
+    start_time = time.perf_counter()
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        expansion_list = get_all_expansions()
+        if PARSE_WORKERS > 0:
+            with CardPipeline(IMAGE_DICT, pokemon_species, CONCURRENCY, PARSE_WORKERS,
+                              parser_backend=PARSER_BACKEND) as pipeline:
+                full_card_list = rip_all_cards(expansion_list, pokemon_species, pipeline=pipeline)
+        else:
+            full_card_list = rip_all_cards(expansion_list, pokemon_species)
+    elapsed = time.perf_counter() - start_time
+    card_count = sum(len(expansion) for expansion in full_card_list)
+    page_count = 2 + len(expansion_list) + card_count
+
+    ## Parse cost on its own: every archived card page parsed serially in this process
+    card_pages = [html for url, html in archive.items() if CARD_PAGE_URL.search(url)]
+    parse_start = time.perf_counter()
+    for html in card_pages:
+        parse_card_page(html)
+    parse_time = time.perf_counter() - parse_start
+
+    own_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    child_rss = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+    print("\nSETTINGS: CONCURRENCY={0}, PARSE_WORKERS={1}, PARSER_BACKEND={2}".format(CONCURRENCY, PARSE_WORKERS, PARSER_BACKEND))
+    print("{0} expansions, {1} cards, {2} pages in {3:.2f} s".format(len(expansion_list), card_count, page_count, elapsed))
+    print("throughput: {0:.1f} pages/s, {1:.1f} cards/s".format(page_count / elapsed, card_count / elapsed))
+    if card_pages:
+        print("parse time: {0:.2f} ms/page (serial, {1} card pages)".format(1000 * parse_time / len(card_pages), len(card_pages)))
+    print("peak RSS: {0:.1f} MB (largest child process: {1:.1f} MB)".format(own_rss / 1024, child_rss / 1024))
@@ -0,0 +1,62 @@
+### Description: builds the cardSearch index from the pickled card list and reports the build
+### time, index file size, load time and query latency (first run, which decodes the postings,
+### and repeated runs), next to a naive scan of every card text for the same query.
+###
+### Usage: python benchmark_search.py [pickle file] [index file]
+
+from cardSearch import *
+import os
+import pickle
+import sys
+import time
+
+QUERIES = ['"discard an energy"', '"flip a coin" paralyzed', 'paralyzed', '"this attack does nothing"',
+           'heads tails bench', 'poisoned confused', '"your opponent\'s active pokémon"']
+
+
+### The grep-like alternative: every text is tokenized and checked for each word and phrase
+def naive_search(texts, query):
+    phrases = [" " + " ".join(tokenize(phrase)) + " " for phrase in PHRASE.findall(query)]
+    words = tokenize(PHRASE.sub(" ", query))
+    results = []
+    for expansion_id, position, card, field, text in texts:
+        tokens = tokenize(text)
+        joined = " " + " ".join(tokens) + " "
+        if all(word in tokens for word in words) and all(phrase in joined for phrase in phrases):
+            results.append((expansion_id, position, card.name, field))
+    return results
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    index_path = sys.argv[2] if len(sys.argv) > 2 else "card_search.index"
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+
+    start_time = time.perf_counter()
+    index = SearchIndex.build(full_card_list)
+    build_time = time.perf_counter() - start_time
+    index.save(index_path)
+    start_time = time.perf_counter()
+    index = SearchIndex.load(index_path)
+    load_time = time.perf_counter() - start_time
+    print("{0}: built in {1:.2f} s, {2:.0f} KB on disk, loaded in {3:.1f} ms\n".format(
+        index, build_time, os.path.getsize(index_path) / 1024, 1000 * load_time))
+
+    texts = list(iter_card_texts(full_card_list))
+    print("{0:<40} {1:>7} {2:>11} {3:>11} {4:>11}".format("QUERY", "MATCHES", "FIRST (MS)", "REPEAT (MS)", "NAIVE (MS)"))
+    for query in QUERIES:
+        start_time = time.perf_counter()
+        index.search(query)
+        first_time = time.perf_counter() - start_time
+        start_time = time.perf_counter()
+        for _ in range(100):
+            index.search(query)
+        repeat_time = (time.perf_counter() - start_time) / 100
+        start_time = time.perf_counter()
+        naive_results = naive_search(texts, query)
+        naive_time = time.perf_counter() - start_time
+        matches = len(index.search(query, limit=len(index)))
+        if not matches == len(naive_results):
+            sys.exit("Index and naive search disagree on " + query)
+        print("{0:<40} {1:>7} {2:>11.3f} {3:>11.3f} {4:>11.1f}".format(query, matches, 1000 * first_time, 1000 * repeat_time, 1000 * naive_time))
@@ -0,0 +1,223 @@
+### Description: an indexed SQLite store for the card list, as an alternative to unpickling all of
+### full_card_list_file.  Cards, attacks, abilities, weaknesses and resistances each get their own
+### table, so consumers can read just the columns and expansions they need, and card objects from
+### PokemonCardClasses are only rebuilt when asked for.
+###
+### Usage: python cardDatabase.py [pickle file] [database file]  (converts the pickle)
+
+from PokemonCardClasses import *
+import json
+import os
+import pickle
+import sqlite3
+import sys
+
+SCHEMA = """
+CREATE TABLE expansions (expansion_id INTEGER PRIMARY KEY, card_count INTEGER);
+CREATE TABLE cards (card_id INTEGER PRIMARY KEY, expansion_id INTEGER, position INTEGER,
+                    card_class TEXT, name TEXT, hp INTEGER, retreat_cost INTEGER, types TEXT,
+                    traits TEXT, subtype TEXT, basic INTEGER, description TEXT);
+CREATE TABLE attacks (card_id INTEGER, position INTEGER, attack_name TEXT, energy_cost TEXT,
+                      base_damage TEXT, description TEXT);
+CREATE TABLE abilities (card_id INTEGER, position INTEGER, ability_name TEXT, description TEXT);
+CREATE TABLE weaknesses (card_id INTEGER, position INTEGER, energy TEXT, adjustment TEXT);
+CREATE TABLE resistances (card_id INTEGER, position INTEGER, energy TEXT, adjustment TEXT);
+CREATE INDEX cards_by_expansion ON cards (expansion_id, position);
+CREATE INDEX cards_by_class ON cards (card_class, expansion_id);
+CREATE INDEX cards_by_name ON cards (name);
+CREATE INDEX cards_by_hp ON cards (hp);
+CREATE INDEX attacks_by_card ON attacks (card_id, position);
+CREATE INDEX attacks_by_name ON attacks (attack_name);
+CREATE INDEX abilities_by_card ON abilities (card_id, position);
+CREATE INDEX abilities_by_name ON abilities (ability_name);
+CREATE INDEX weaknesses_by_card ON weaknesses (card_id, position);
+CREATE INDEX weaknesses_by_energy ON weaknesses (energy);
+CREATE INDEX resistances_by_card ON resistances (card_id, position);
+CREATE INDEX resistances_by_energy ON resistances (energy);
+"""
+
+## List-valued fields are stored as JSON so that they come back exactly as they went in
+CARD_COLUMNS = ("card_id", "expansion_id", "position", "card_class", "name", "hp", "retreat_cost",
+                "types", "traits", "subtype", "basic", "description")
+JSON_COLUMNS = ("types", "traits", "subtype")
+CHILD_COLUMNS = {"attacks":("card_id", "position", "attack_name", "energy_cost", "base_damage", "description"),
+                 "abilities":("card_id", "position", "ability_name", "description"),
+                 "weaknesses":("card_id", "position", "energy", "adjustment"),
+                 "resistances":("card_id", "position", "energy", "adjustment")}
+
+
+### Function description: writes a card list (a list of expansions, each a list of cards) to a
+### new database file, replacing any existing one
+def write_card_list(full_card_list, db_path):
+    if os.path.exists(db_path):
+        os.remove(db_path)
+    connection = sqlite3.connect(db_path)
+    connection.executescript(SCHEMA)
+    card_rows, attack_rows, ability_rows, weakness_rows, resistance_rows = [], [], [], [], []
+    card_id = 0
+    for expansion_id, expansion in enumerate(full_card_list):
+        connection.execute("INSERT INTO expansions VALUES (?, ?)", (expansion_id, len(expansion)))
+        for position, card in enumerate(expansion):
+            card_class = type(card).__name__
+            row = dict.fromkeys(CARD_COLUMNS)
+            row.update(card_id=card_id, expansion_id=expansion_id, position=position,
+                       card_class=card_class, name=card.name)
+            if card_class == "PokemonCard":
+                row.update(hp=card.HP, retreat_cost=card.retreat_cost, types=json.dumps(card.type),
+                           traits=json.dumps(card.traits))
+                for n, attack in enumerate(card.attacks):
+                    attack_rows.append((card_id, n, attack.attack_name, json.dumps(attack.energy_cost),
+                                        attack.base_damage, attack.description))
+                for n, (ability, description) in enumerate(card.abilities.items()):
+                    ability_rows.append((card_id, n, ability, description))
+                for n, (energy, adjustment) in enumerate(card.weaknesses.items()):
+                    weakness_rows.append((card_id, n, energy, adjustment))
+                for n, (energy, adjustment) in enumerate(card.resistances.items()):
+                    resistance_rows.append((card_id, n, energy, adjustment))
+            elif card_class == "TrainerCard":
+                row.update(subtype=json.dumps(card.subtype), description=card.description)
+            elif card_class == "EnergyCard":
+                row.update(basic=int(card.basic), description=card.description)
+            card_rows.append(tuple(row[column] for column in CARD_COLUMNS))
+            card_id += 1
+    connection.executemany("INSERT INTO cards VALUES (" + ", ".join("?" * len(CARD_COLUMNS)) + ")", card_rows)
+    connection.executemany("INSERT INTO attacks VALUES (?, ?, ?, ?, ?, ?)", attack_rows)
+    connection.executemany("INSERT INTO abilities VALUES (?, ?, ?, ?)", ability_rows)
+    connection.executemany("INSERT INTO weaknesses VALUES (?, ?, ?, ?)", weakness_rows)
+    connection.executemany("INSERT INTO resistances VALUES (?, ?, ?, ?)", resistance_rows)
+    connection.commit()
+    connection.close()
+
+
+### Function description: converts the existing pickled card list into a database file
+def convert_pickle(pickle_path="full_card_list_file", db_path="full_card_list.db"):
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+    write_card_list(full_card_list, db_path)
+    return db_path
+
+
+class CardDatabase():
+
+    def __init__(self, db_path="full_card_list.db"):
+        self.db_path = db_path
+        self.connection = sqlite3.connect(db_path)
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.connection.close()
+
+    def expansion_count(self):
+        return self.connection.execute("SELECT COUNT(*) FROM expansions").fetchone()[0]
+
+    ## Builds the WHERE clause shared by the readers below
+    @staticmethod
+    def _card_filter(expansions, card_class):
+        clauses, parameters = [], []
+        if expansions is not None:
+            expansions = list(expansions)
+            clauses.append("expansion_id IN (" + ", ".join("?" * len(expansions)) + ")")
+            parameters.extend(expansions)
+        if card_class is not None:
+            clauses.append("card_class = ?")
+            parameters.append(card_class)
+        where = " WHERE " + " AND ".join(clauses) if clauses else ""
+        return where, parameters
+
+    ## Function description: returns rows of just the requested columns of the cards table (e.g.
+    ## ["name", "hp"]) for the given expansions and/or card class, in card order
+    def read_columns(self, columns, expansions=None, card_class=None):
+        for column in columns:
+            if column not in CARD_COLUMNS:
+                raise ValueError("Unknown card column: " + column)
+        where, parameters = self._card_filter(expansions, card_class)
+        query = "SELECT {0} FROM cards{1} ORDER BY card_id".format(", ".join(columns), where)
+        return self.connection.execute(query, parameters).fetchall()
+
+    ## Function description: returns rows of the requested columns of one of the attacks,
+    ## abilities, weaknesses or resistances tables (card columns such as "name" may be mixed in),
+    ## for the given expansions, in card order
+    def read_table(self, table, columns, expansions=None):
+        if table not in CHILD_COLUMNS:
+            raise ValueError("Unknown table: " + table)
+        for column in columns:
+            if column not in CHILD_COLUMNS[table] and column not in CARD_COLUMNS:
+                raise ValueError("Unknown {0} column: {1}".format(table, column))
+        columns = [table + "." + column if column in CHILD_COLUMNS[table] else "cards." + column for column in columns]
+        where, parameters = self._card_filter(expansions, None)
+        query = "SELECT {0} FROM {1} JOIN cards USING (card_id){2} ORDER BY card_id, {1}.position"
+        return self.connection.execute(query.format(", ".join(columns), table, where), parameters).fetchall()
+
+    ## Fetches the rows of a child table for the selected cards, grouped by card_id
+    def _child_rows(self, table, columns, where, parameters):
+        query = "SELECT card_id, {0} FROM {1} WHERE card_id IN (SELECT card_id FROM cards{2}) ORDER BY card_id, position"
+        grouped = {}
+        for row in self.connection.execute(query.format(", ".join(columns), table, where), parameters):
+            grouped.setdefault(row[0], []).append(row[1:])
+        return grouped
+
+    ## Function description: rebuilds card objects for the given expansions and/or card class (e.g.
+    ## "PokemonCard"); yields (expansion_id, card) pairs in the original order
+    def iter_cards(self, expansions=None, card_class=None):
+        where, parameters = self._card_filter(expansions, card_class)
+        attacks = self._child_rows("attacks", ("attack_name", "energy_cost", "base_damage", "description"), where, parameters)
+        abilities = self._child_rows("abilities", ("ability_name", "description"), where, parameters)
+        weaknesses = self._child_rows("weaknesses", ("energy", "adjustment"), where, parameters)
+        resistances = self._child_rows("resistances", ("energy", "adjustment"), where, parameters)
+
+        query = "SELECT {0} FROM cards{1} ORDER BY card_id".format(", ".join(CARD_COLUMNS), where)
+        for row in self.connection.execute(query, parameters):
+            row = dict(zip(CARD_COLUMNS, row))
+            for column in JSON_COLUMNS:
+                if row[column] is not None:
+                    row[column] = json.loads(row[column])
+            card_id = row["card_id"]
+            if row["card_class"] == "PokemonCard":
+                card = PokemonCard()
+                card.HP = row["hp"]
+                card.retreat_cost = row["retreat_cost"]
+                card.type = row["types"]
+                card.traits = row["traits"]
+                for attack_name, energy_cost, base_damage, description in attacks.get(card_id, []):
+                    attack = PokemonCardAttack()
+                    attack.attack_name = attack_name
+                    attack.energy_cost = json.loads(energy_cost)
+                    attack.base_damage = base_damage
+                    attack.description = description
+                    card.attacks.append(attack)
+                card.abilities = dict(abilities.get(card_id, []))
+                card.weaknesses = dict(weaknesses.get(card_id, []))
+                card.resistances = dict(resistances.get(card_id, []))
+            elif row["card_class"] == "TrainerCard":
+                card = TrainerCard()
+                card.subtype = row["subtype"]
+                card.description = row["description"]
+            else:
+                card = EnergyCard()
+                card.basic = bool(row["basic"])
+                card.description = row["description"]
+            card.name = row["name"]
+            yield row["expansion_id"], card
+
+    ## Function description: rebuilds the card list in the same nested-list layout as the pickle
+    def load_card_list(self, expansions=None, card_class=None):
+        if expansions is None:
+            expansions = range(self.expansion_count())
+        full_card_list = {expansion_id:[] for expansion_id in expansions}
+        for expansion_id, card in self.iter_cards(expansions, card_class):
+            full_card_list[expansion_id].append(card)
+        return list(full_card_list.values())
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    db_path = sys.argv[2] if len(sys.argv) > 2 else "full_card_list.db"
+    convert_pickle(pickle_path, db_path)
+    with CardDatabase(db_path) as database:
+        print("Wrote {0} expansions, {1} cards to {2}".format(database.expansion_count(),
+              len(database.read_columns(["card_id"])), db_path))
@@ -0,0 +1,132 @@
+### Description: reprint detection.  Every card gets a content hash over its normalized rules text
+### (name, HP, types, attacks, abilities, weaknesses, resistances and retreat cost for Pokémon; name,
+### subtype and description for Trainers; name and description for Energy), so reprints of the
+### same card in different expansions and promo sets share a hash.  ReprintIndex maps each hash to
+### the card's first appearance and all of its reprints, and unique_cards() filters a stream of
+### cards down to first appearances.
+###
+### Usage: python cardDedup.py [pickle file] [index file]  (builds the index and prints a summary)
+
+from PokemonCardClasses import *
+import hashlib
+import json
+import os
+import pickle
+import re
+import sys
+
+WHITESPACE = re.compile(r"\s+")
+
+
+def normalize(text):
+    return WHITESPACE.sub(" ", text).strip().lower()
+
+
+### Function description: the canonical form of a card that the hash is taken over, as a nested
+### tuple of normalized values.  Dictionaries are sorted so that their order does not matter.
+def canonical_card(card):
+    card_class = type(card).__name__
+    if card_class == "PokemonCard":
+        attacks = tuple((normalize(attack.attack_name), tuple(sorted(attack.energy_cost)),
+                         normalize(attack.base_damage), normalize(attack.description)) for attack in card.attacks)
+        abilities = tuple(sorted((normalize(ability), normalize(description)) for ability, description in card.abilities.items()))
+        return (card_class, normalize(card.name), card.HP, tuple(sorted(card.type)), attacks, abilities,
+                tuple(sorted((energy, normalize(adjust)) for energy, adjust in card.weaknesses.items())),
+                tuple(sorted((energy, normalize(adjust)) for energy, adjust in card.resistances.items())),
+                card.retreat_cost)
+    if card_class == "TrainerCard":
+        return (card_class, normalize(card.name), tuple(card.subtype), normalize(card.description))
+    return (card_class, normalize(card.name), normalize(card.description))
+
+
+def card_hash(card):
+    return hashlib.sha1(repr(canonical_card(card)).encode("utf-8")).hexdigest()
+
+
+### Function description: yields only the first appearance of every card from an iterable of
+### (expansion_id, card) pairs, e.g. CardStream.iter_cards(); reprints later in the list are
+### dropped
+def unique_cards(cards):
+    seen = set()
+    for expansion_id, card in cards:
+        content_hash = card_hash(card)
+        if content_hash not in seen:
+            seen.add(content_hash)
+            yield expansion_id, card
+
+
+class ReprintIndex():
+
+    ## appearances maps each hash to the list of [expansion_id, position in expansion] where the
+    ## card appears, first appearance first, and names maps each hash to the card's name
+    def __init__(self, appearances=None, names=None):
+        self.appearances = appearances if appearances is not None else {}
+        self.names = names if names is not None else {}
+
+    def __repr__(self):
+        output = "REPRINT INDEX: {0} CARDS, {1} UNIQUE, {2} REPRINTED"
+        return output.format(sum(len(places) for places in self.appearances.values()), len(self.appearances),
+                             sum(1 for places in self.appearances.values() if len(places) > 1))
+
+    def __len__(self):
+        return len(self.appearances)
+
+    ## Function description: adds one card; returns its hash
+    def add(self, expansion_id, position, card):
+        content_hash = card_hash(card)
+        if content_hash not in self.appearances:
+            self.appearances[content_hash] = []
+            self.names[content_hash] = card.name
+        self.appearances[content_hash].append([expansion_id, position])
+        return content_hash
+
+    ## Function description: builds the index for a card list (a list of expansions, each a list of
+    ## cards)
+    @classmethod
+    def build(cls, full_card_list):
+        index = cls()
+        for expansion_id, expansion in enumerate(full_card_list):
+            for position, card in enumerate(expansion):
+                index.add(expansion_id, position, card)
+        return index
+
+    def first_appearance(self, content_hash):
+        return tuple(self.appearances[content_hash][0])
+
+    ## All appearances after the first one
+    def reprints(self, content_hash):
+        return [tuple(place) for place in self.appearances[content_hash][1:]]
+
+    ## Function description: returns the set of (expansion_id, position) of every card that is a
+    ## reprint of an earlier one
+    def reprint_positions(self):
+        return {tuple(place) for places in self.appearances.values() for place in places[1:]}
+
+    ## Function description: the most reprinted cards as (name, number of appearances, hash)
+    def most_reprinted(self, count=10):
+        ranked = sorted(self.appearances, key=lambda content_hash: -len(self.appearances[content_hash]))
+        return [(self.names[content_hash], len(self.appearances[content_hash]), content_hash) for content_hash in ranked[:count]]
+
+    def save(self, path):
+        temp_path = path + ".tmp"
+        with open(temp_path, "w") as file:
+            json.dump({"appearances":self.appearances, "names":self.names}, file)
+        os.replace(temp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r") as file:
+            data = json.load(file)
+        return cls(data["appearances"], data["names"])
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    index_path = sys.argv[2] if len(sys.argv) > 2 else "reprint_index.json"
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+    index = ReprintIndex.build(full_card_list)
+    index.save(index_path)
+    print(index)
+    for name, appearances, content_hash in index.most_reprinted():
+        print("  {0}: {1} appearances".format(name, appearances))
@@ -0,0 +1,116 @@
+### Description: exports the numeric side of the Pokémon cards as NumPy structured arrays, so that
+### questions about power creep (HP, retreat cost, attack cost against damage, by expansion) become
+### vectorized operations instead of loops over card objects.  There are two tables: one row per
+### Pokémon card, and one row per attack with the row number of the card it belongs to.  Both are
+### cached as .npy files and rebuilt when the card list is newer than the cache.
+###
+### Usage: python cardFeatures.py  (prints average HP, retreat cost and damage per expansion)
+
+from PokemonCardClasses import *
+from cardStream import open_card_list, card_list_path
+import numpy as np
+import os
+import re
+import time
+
+## Energy codes used in card types and attack costs (see IMAGE_DICT in card_rip_test.py)
+ENERGY_TYPES = ("C", "D", "E", "F", "G", "K", "M", "P", "R", "W", "Y")
+
+CARD_DTYPE = np.dtype([("expansion", np.int16), ("position", np.int16), ("hp", np.int16),
+                       ("retreat_cost", np.int8), ("attack_count", np.int8), ("ability_count", np.int8)] +
+                      [("type_" + energy, np.bool_) for energy in ENERGY_TYPES])
+
+## cost_total is the sum of the cost_* columns, so a free attack (cost "-", the empty.png icon)
+## costs 0.  damage is -1 when base_damage is not a number (e.g. "?"); damage_modifier is "+",
+## "x", "-" or ""
+ATTACK_DTYPE = np.dtype([("card", np.int32), ("expansion", np.int16), ("position", np.int8),
+                         ("cost_total", np.int8)] +
+                        [("cost_" + energy, np.int8) for energy in ENERGY_TYPES] +
+                        [("damage", np.int16), ("damage_modifier", "U1")])
+
+DAMAGE = re.compile(r"^\s*([0-9]+)\s*(\+|plus|x|×|-)?\s*$", re.IGNORECASE)
+DAMAGE_MODIFIERS = {"+":"+", "plus":"+", "x":"x", "×":"x", "-":"-"}
+
+## Bumped whenever the way the arrays are built changes, so caches written by an older version
+## are never read
+FEATURES_VERSION = 2
+CARD_FEATURES_FILE = "card_features.v{0}.npy".format(FEATURES_VERSION)
+ATTACK_FEATURES_FILE = "attack_features.v{0}.npy".format(FEATURES_VERSION)
+
+
+### Function description: splits a base_damage string such as "30+", "20x" or "10Plus" into
+### (30, "+"); anything that is not a number comes back as (-1, "")
+def parse_damage(base_damage):
+    match = DAMAGE.match(base_damage)
+    if match is None:
+        return -1, ""
+    modifier = match.group(2)
+    return int(match.group(1)), DAMAGE_MODIFIERS[modifier.lower()] if modifier else ""
+
+
+### Function description: builds the card and attack arrays from (expansion_id, card) pairs, e.g.
+### from CardStream.iter_cards() over all cards; cards other than Pokémon are skipped
+def build_feature_arrays(cards):
+    card_rows, attack_rows = [], []
+    expansion_positions = {}
+    for expansion_id, card in cards:
+        position = expansion_positions.get(expansion_id, 0)
+        expansion_positions[expansion_id] = position + 1
+        if not type(card).__name__ == "PokemonCard":
+            continue
+        card_row = len(card_rows)
+        card_rows.append((expansion_id, position, card.HP, card.retreat_cost, len(card.attacks), len(card.abilities)) +
+                         tuple(energy in card.type for energy in ENERGY_TYPES))
+        for attack_position, attack in enumerate(card.attacks):
+            damage, modifier = parse_damage(attack.base_damage)
+            cost = tuple(attack.energy_cost.count(energy) for energy in ENERGY_TYPES)
+            attack_rows.append((card_row, expansion_id, attack_position, sum(cost)) + cost + (damage, modifier))
+    return np.array(card_rows, dtype=CARD_DTYPE), np.array(attack_rows, dtype=ATTACK_DTYPE)
+
+
+### Function description: returns the (card, attack) arrays, from the .npy cache in cache_dir if
+### it is newer than the saved card list, and otherwise built from the card list and cached
+def load_feature_arrays(cache_dir=".", stream_path="full_card_list.cards", pickle_path="full_card_list_file"):
+    card_path = os.path.join(cache_dir, CARD_FEATURES_FILE)
+    attack_path = os.path.join(cache_dir, ATTACK_FEATURES_FILE)
+    source_path = card_list_path(stream_path, pickle_path)
+    if os.path.exists(card_path) and os.path.exists(attack_path) and \
+       min(os.path.getmtime(card_path), os.path.getmtime(attack_path)) >= os.path.getmtime(source_path):
+        return np.load(card_path), np.load(attack_path)
+    ## All cards are read, not just the Pokémon, so that positions within expansions are right
+    card_array, attack_array = build_feature_arrays(open_card_list(stream_path, pickle_path).iter_cards())
+    os.makedirs(cache_dir, exist_ok=True)
+    np.save(card_path, card_array)
+    np.save(attack_path, attack_array)
+    return card_array, attack_array
+
+
+### Function description: the mean of values for each group key (keys are small non-negative
+### integers such as expansion ids); groups with no rows come back as NaN
+def group_mean(keys, values):
+    counts = np.bincount(keys)
+    sums = np.bincount(keys, weights=values, minlength=len(counts))
+    with np.errstate(invalid="ignore", divide="ignore"):
+        return sums / counts
+
+
+if __name__ == "__main__":
+    start_time = time.perf_counter()
+    card_array, attack_array = load_feature_arrays()
+    load_time = time.perf_counter() - start_time
+
+    start_time = time.perf_counter()
+    mean_hp = group_mean(card_array["expansion"], card_array["hp"])
+    mean_retreat = group_mean(card_array["expansion"], card_array["retreat_cost"])
+    damaging = (attack_array["damage"] > 0) & (attack_array["cost_total"] > 0)
+    damage_per_energy = group_mean(attack_array["expansion"][damaging],
+                                   attack_array["damage"][damaging] / attack_array["cost_total"][damaging])
+    analysis_time = time.perf_counter() - start_time
+
+    print("{0} Pokémon, {1} attacks; loaded in {2:.1f} ms, grouped in {3:.2f} ms\n".format(
+        len(card_array), len(attack_array), 1000 * load_time, 1000 * analysis_time))
+    print("{0:>9} {1:>8} {2:>8} {3:>15}".format("EXPANSION", "HP", "RETREAT", "DAMAGE/ENERGY"))
+    for expansion in range(len(mean_hp)):
+        if not np.isnan(mean_hp[expansion]):
+            damage = damage_per_energy[expansion] if expansion < len(damage_per_energy) else float("nan")
+            print("{0:>9} {1:>8.1f} {2:>8.2f} {3:>15.1f}".format(expansion, mean_hp[expansion], mean_retreat[expansion], damage))
@@ -0,0 +1,211 @@
+### Description: an in-memory query engine for the card list.  CardIndex builds secondary indexes
+### over the PokemonCard fields once (type, HP, retreat cost, traits, weaknesses, resistances,
+### attack energy costs and attack names), so that questions like "all Fire Pokémon with HP >= 100"
+### or "all cards weak to Water" are answered by intersecting index entries instead of scanning
+### every card.
+###
+### Usage: python cardQuery.py [pickle file]  (prints a few example queries)
+
+from PokemonCardClasses import *
+import bisect
+import pickle
+import sys
+
+## Criteria accepted by CardIndex.query() and matches().  Every criterion takes a single value and
+## all given criteria must hold.
+##   card_class     "PokemonCard", "TrainerCard" or "EnergyCard"
+##   name           exact card name
+##   expansion_id   position of the expansion in the card list, counting from 0
+##   type           an energy code the Pokémon has among its types, e.g. "R"
+##   hp_min/hp_max  inclusive HP bounds
+##   retreat_cost   exact retreat cost
+##   trait          one of the card's traits, e.g. "Pokémon-EX"
+##   weak_to        an energy code among the card's weaknesses
+##   resistant_to   an energy code among the card's resistances
+##   attack_cost    the energy cost of one of the card's attacks, as a list in any order,
+##                  e.g. ["C", "C", "C"]
+##   attack_name    exact name of one of the card's attacks
+CRITERIA = ("card_class", "name", "expansion_id", "type", "hp_min", "hp_max", "retreat_cost", "trait",
+            "weak_to", "resistant_to", "attack_cost", "attack_name")
+
+
+### Energy costs are compared as multisets, so ["W", "C"] and ["C", "W"] are the same cost
+def cost_key(energy_cost):
+    return tuple(sorted(energy_cost))
+
+
+def _check_criteria(criteria):
+    for criterion in criteria:
+        if criterion not in CRITERIA:
+            raise ValueError("Unknown query criterion: " + criterion)
+
+
+### Function description: the naive version of a query for a single card (from expansion
+### card_expansion_id); True if the card meets every criterion.  Used for the comparison in
+### benchmark_query.py and as the reference the indexes must agree with.
+def matches(card, card_expansion_id, **criteria):
+    _check_criteria(criteria)
+    card_class = type(card).__name__
+    if "expansion_id" in criteria and not criteria["expansion_id"] == card_expansion_id:
+        return False
+    if "card_class" in criteria and not card_class == criteria["card_class"]:
+        return False
+    if "name" in criteria and not card.name == criteria["name"]:
+        return False
+    pokemon_criteria = set(criteria) - {"card_class", "name", "expansion_id"}
+    if not pokemon_criteria:
+        return True
+    if not card_class == "PokemonCard":
+        return False
+    if "type" in criteria and criteria["type"] not in card.type:
+        return False
+    if "hp_min" in criteria and card.HP < criteria["hp_min"]:
+        return False
+    if "hp_max" in criteria and card.HP > criteria["hp_max"]:
+        return False
+    if "retreat_cost" in criteria and not card.retreat_cost == criteria["retreat_cost"]:
+        return False
+    if "trait" in criteria and criteria["trait"] not in card.traits:
+        return False
+    if "weak_to" in criteria and criteria["weak_to"] not in card.weaknesses:
+        return False
+    if "resistant_to" in criteria and criteria["resistant_to"] not in card.resistances:
+        return False
+    if "attack_cost" in criteria:
+        wanted_cost = cost_key(criteria["attack_cost"])
+        if not any(cost_key(attack.energy_cost) == wanted_cost for attack in card.attacks):
+            return False
+    if "attack_name" in criteria:
+        if not any(attack.attack_name == criteria["attack_name"] for attack in card.attacks):
+            return False
+    return True
+
+
+### Function description: the naive full scan; returns every (expansion_id, card) pair meeting
+### the criteria, in card list order
+def scan(full_card_list, **criteria):
+    return [(expansion_id, card) for expansion_id, expansion in enumerate(full_card_list)
+            for card in expansion if matches(card, expansion_id, **criteria)]
+
+
+class CardIndex():
+
+    ## full_card_list is the usual list of expansions, each a list of cards.  Every card gets an id,
+    ## its position in the flattened list, and every index maps a value to the set of card ids
+    ## that have it.
+    def __init__(self, full_card_list):
+        self.cards = []
+        self.expansion_ids = []
+        self.indexes = {criterion:{} for criterion in ("card_class", "name", "expansion_id", "type", "retreat_cost",
+                                                       "trait", "weak_to", "resistant_to", "attack_cost", "attack_name")}
+        ## HP is kept as a sorted list of (HP, card id) for range lookups
+        hp_entries = []
+
+        for expansion_id, expansion in enumerate(full_card_list):
+            for card in expansion:
+                card_id = len(self.cards)
+                self.cards.append(card)
+                self.expansion_ids.append(expansion_id)
+                card_class = type(card).__name__
+                self._add("card_class", card_class, card_id)
+                self._add("name", card.name, card_id)
+                self._add("expansion_id", expansion_id, card_id)
+                if not card_class == "PokemonCard":
+                    continue
+                hp_entries.append((card.HP, card_id))
+                self._add("retreat_cost", card.retreat_cost, card_id)
+                for energy in card.type:
+                    self._add("type", energy, card_id)
+                for trait in card.traits:
+                    self._add("trait", trait, card_id)
+                for energy in card.weaknesses:
+                    self._add("weak_to", energy, card_id)
+                for energy in card.resistances:
+                    self._add("resistant_to", energy, card_id)
+                for attack in card.attacks:
+                    self._add("attack_cost", cost_key(attack.energy_cost), card_id)
+                    self._add("attack_name", attack.attack_name, card_id)
+
+        hp_entries.sort()
+        self.hp_values = [hp for hp, card_id in hp_entries]
+        self.hp_card_ids = [card_id for hp, card_id in hp_entries]
+
+    def __repr__(self):
+        return "CARD INDEX: {0} CARDS, {1} POKEMON".format(len(self.cards), len(self.hp_values))
+
+    def __len__(self):
+        return len(self.cards)
+
+    def _add(self, criterion, value, card_id):
+        self.indexes[criterion].setdefault(value, set()).add(card_id)
+
+    ## Card ids with hp_min <= HP <= hp_max
+    def _hp_range(self, hp_min, hp_max):
+        start = 0 if hp_min is None else bisect.bisect_left(self.hp_values, hp_min)
+        stop = len(self.hp_values) if hp_max is None else bisect.bisect_right(self.hp_values, hp_max)
+        return set(self.hp_card_ids[start:stop])
+
+    ## Function description: returns the ids of the cards meeting every criterion, in card list
+    ## order.  The candidate sets are intersected smallest first.
+    def query_ids(self, **criteria):
+        _check_criteria(criteria)
+        candidate_sets = []
+        for criterion, value in criteria.items():
+            if criterion in ("hp_min", "hp_max"):
+                continue
+            if criterion == "attack_cost":
+                value = cost_key(value)
+            candidate_sets.append(self.indexes[criterion].get(value, set()))
+        if "hp_min" in criteria or "hp_max" in criteria:
+            candidate_sets.append(self._hp_range(criteria.get("hp_min"), criteria.get("hp_max")))
+        if not candidate_sets:
+            return list(range(len(self.cards)))
+
+        candidate_sets.sort(key=len)
+        card_ids = set(candidate_sets[0])
+        for candidates in candidate_sets[1:]:
+            if not card_ids:
+                break
+            card_ids &= candidates
+        return sorted(card_ids)
+
+    ## Function description: returns (expansion_id, card) pairs for the cards meeting every
+    ## criterion, in the same order scan() would give
+    def query(self, **criteria):
+        return [(self.expansion_ids[card_id], self.cards[card_id]) for card_id in self.query_ids(**criteria)]
+
+    def count(self, **criteria):
+        return len(self.query_ids(**criteria))
+
+    ## Function description: returns (expansion_id, card, attack) for each attack of the matching
+    ## cards that itself has the requested cost and/or name, e.g. every attack costing three
+    ## colorless rather than every card with one
+    def query_attacks(self, **criteria):
+        attack_criteria = {criterion:criteria[criterion] for criterion in ("attack_cost", "attack_name") if criterion in criteria}
+        attacks = []
+        for expansion_id, card in self.query(**criteria):
+            for attack in card.attacks:
+                if "attack_cost" in attack_criteria and not cost_key(attack.energy_cost) == cost_key(attack_criteria["attack_cost"]):
+                    continue
+                if "attack_name" in attack_criteria and not attack.attack_name == attack_criteria["attack_name"]:
+                    continue
+                attacks.append((expansion_id, card, attack))
+        return attacks
+
+    ## Function description: the distinct values of one index with how many cards have each,
+    ## most common first (e.g. values("trait"))
+    def values(self, criterion):
+        counts = [(value, len(card_ids)) for value, card_ids in self.indexes[criterion].items()]
+        return sorted(counts, key=lambda count: (-count[1], str(count[0])))
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+    index = CardIndex(full_card_list)
+    print(index)
+    print("Fire Pokémon with HP >= 100:", index.count(type="R", hp_min=100))
+    print("Attacks costing three colorless:", len(index.query_attacks(attack_cost=["C", "C", "C"])))
+    print("Cards weak to Water:", index.count(weak_to="W"))
+    print("Pokémon-EX with free retreat:", [card.name for expansion_id, card in index.query(trait="Pokémon-EX", retreat_cost=0)])
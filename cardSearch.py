@@ -0,0 +1,261 @@
+### Description: a full-text inverted index over the card texts: attack descriptions, abilities,
+### and Trainer and Energy card descriptions.  Every text is one document; the index keeps
+### positional postings so quoted phrases can be matched, and results are ranked with BM25.
+###
+### The index is saved as a zlib-compressed marshal dump.  Each term's postings are stored as two
+### byte strings of varint-encoded deltas, one with the documents and term frequencies and one
+### with the positions, and they are only decoded when a query first uses that term.
+###
+### Usage: python cardSearch.py <query> [index file]
+###        (builds card_search.index from full_card_list_file if it does not exist yet), e.g.
+###        python cardSearch.py '"discard an energy" paralyzed'
+
+from PokemonCardClasses import *
+import heapq
+import math
+import marshal
+import os
+import pickle
+import re
+import sys
+import zlib
+
+INDEX_VERSION = 1
+TOKEN = re.compile(r"\w+")
+PHRASE = re.compile(r'"([^"]*)"')
+
+## BM25 parameters
+K1 = 1.2
+B = 0.75
+MAX_CACHED_PHRASES = 1024
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+### Varint encoding of lists of non-negative integers, 7 bits per byte
+def encode_varints(numbers):
+    output = bytearray()
+    for number in numbers:
+        while number >= 0x80:
+            output.append((number & 0x7F) | 0x80)
+            number >>= 7
+        output.append(number)
+    return bytes(output)
+
+def decode_varints(data):
+    numbers = []
+    number, shift = 0, 0
+    for byte in data:
+        if byte & 0x80:
+            number |= (byte & 0x7F) << shift
+            shift += 7
+        else:
+            numbers.append(number | (byte << shift))
+            number, shift = 0, 0
+    return numbers
+
+
+### Function description: yields (expansion_id, position, card, field, text) for every searchable
+### text on every card.  field says where the text came from, e.g. "attack: Thunderbolt".
+def iter_card_texts(full_card_list):
+    for expansion_id, expansion in enumerate(full_card_list):
+        for position, card in enumerate(expansion):
+            if type(card).__name__ == "PokemonCard":
+                for ability, description in card.abilities.items():
+                    yield expansion_id, position, card, "ability: " + ability, description
+                for attack in card.attacks:
+                    yield expansion_id, position, card, "attack: " + attack.attack_name, attack.description
+            else:
+                yield expansion_id, position, card, "description", card.description
+
+
+class SearchIndex():
+
+    ## The documents are kept as parallel lists (expansion, position in expansion, card name, field,
+    ## length in tokens), and terms maps each term to (document frequency, document postings,
+    ## position postings)
+    def __init__(self, documents, terms):
+        self.expansion_ids, self.positions, self.card_names, self.fields, self.lengths = documents
+        self.terms = terms
+        self.average_length = sum(self.lengths) / len(self.lengths) if self.lengths else 0.0
+        self._postings = {}
+        self._term_positions = {}
+        self._length_norms = None
+        self._phrases = {}
+
+    def __repr__(self):
+        return "SEARCH INDEX: {0} DOCUMENTS, {1} TERMS".format(len(self.lengths), len(self.terms))
+
+    def __len__(self):
+        return len(self.lengths)
+
+    ## Function description: builds the index from a card list (a list of expansions, each a list
+    ## of cards)
+    @classmethod
+    def build(cls, full_card_list):
+        documents = ([], [], [], [], [])
+        term_postings = {}
+        for expansion_id, position, card, field, text in iter_card_texts(full_card_list):
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            doc_id = len(documents[0])
+            for column, value in zip(documents, (expansion_id, position, card.name, field, len(tokens))):
+                column.append(value)
+            token_positions = {}
+            for token_position, token in enumerate(tokens):
+                token_positions.setdefault(token, []).append(token_position)
+            for token, occurrences in token_positions.items():
+                term_postings.setdefault(token, []).append((doc_id, occurrences))
+
+        terms = {}
+        for term, postings in term_postings.items():
+            doc_numbers, position_numbers = [], []
+            previous_doc = 0
+            for doc_id, occurrences in postings:
+                doc_numbers.extend((doc_id - previous_doc, len(occurrences)))
+                previous_doc = doc_id
+                previous_position = 0
+                for token_position in occurrences:
+                    position_numbers.append(token_position - previous_position)
+                    previous_position = token_position
+            terms[term] = (len(postings), encode_varints(doc_numbers), encode_varints(position_numbers))
+        return cls(documents, terms)
+
+    def save(self, path):
+        documents = (self.expansion_ids, self.positions, self.card_names, self.fields, self.lengths)
+        data = zlib.compress(marshal.dumps((INDEX_VERSION, documents, self.terms)), 6)
+        temporary_path = path + ".tmp"
+        with open(temporary_path, "wb") as file:
+            file.write(data)
+        os.replace(temporary_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "rb") as file:
+            version, documents, terms = marshal.loads(zlib.decompress(file.read()))
+        if not version == INDEX_VERSION:
+            raise ValueError("Unsupported search index version {0} in {1}".format(version, path))
+        return cls(documents, terms)
+
+    ## Decoded {doc_id: term frequency} for a term, decoded on first use
+    def postings(self, term):
+        if term not in self._postings:
+            numbers = decode_varints(self.terms[term][1]) if term in self.terms else []
+            postings = {}
+            doc_id = 0
+            for n in range(0, len(numbers), 2):
+                doc_id += numbers[n]
+                postings[doc_id] = numbers[n + 1]
+            self._postings[term] = postings
+        return self._postings[term]
+
+    ## Decoded {doc_id: [token positions]} for a term, only needed for phrases
+    def term_positions(self, term):
+        if term not in self._term_positions:
+            numbers = decode_varints(self.terms[term][2]) if term in self.terms else []
+            term_positions = {}
+            offset = 0
+            for doc_id, frequency in self.postings(term).items():
+                occurrences = []
+                token_position = 0
+                for delta in numbers[offset:offset + frequency]:
+                    token_position += delta
+                    occurrences.append(token_position)
+                term_positions[doc_id] = occurrences
+                offset += frequency
+            self._term_positions[term] = term_positions
+        return self._term_positions[term]
+
+    ## Function description: returns the set of documents containing the words of a phrase next to
+    ## each other, in order.  Results are kept, since the same phrases tend to be searched again.
+    def phrase_documents(self, words):
+        words = tuple(words)
+        if words in self._phrases:
+            return self._phrases[words]
+        doc_sets = sorted((self.postings(word).keys() for word in words), key=len)
+        doc_ids = set(doc_sets[0]) if doc_sets else set()
+        for doc_set in doc_sets[1:]:
+            doc_ids &= doc_set
+        word_positions = [self.term_positions(word) for word in words]
+        matched = set()
+        for doc_id in doc_ids:
+            starts = set(word_positions[0][doc_id])
+            for offset in range(1, len(words)):
+                starts.intersection_update([token_position - offset for token_position in word_positions[offset][doc_id]])
+                if not starts:
+                    break
+            if starts:
+                matched.add(doc_id)
+        if len(self._phrases) >= MAX_CACHED_PHRASES:
+            self._phrases.clear()
+        self._phrases[words] = matched
+        return matched
+
+    def idf(self, term):
+        doc_frequency = self.terms[term][0] if term in self.terms else 0
+        return math.log(1 + (len(self.lengths) - doc_frequency + 0.5) / (doc_frequency + 0.5))
+
+    ## Function description: runs a query and returns up to limit results as (score, expansion_id,
+    ## position, card name, field), best first.  Words in double quotes must appear as a phrase;
+    ## every word and phrase must be present in a document unless require_all is False, in which
+    ## case any single word is enough.  Scores are BM25 over all the query words.
+    def search(self, query, limit=10, require_all=True):
+        phrases = [tokenize(phrase) for phrase in PHRASE.findall(query)]
+        phrases = [words for words in phrases if words]
+        words = tokenize(PHRASE.sub(" ", query)) + [word for phrase in phrases for word in phrase]
+        if not words:
+            return []
+
+        if require_all:
+            doc_sets = [self.postings(word).keys() for word in set(words)]
+            doc_sets.sort(key=len)
+            candidates = set(doc_sets[0])
+            for doc_set in doc_sets[1:]:
+                candidates &= doc_set
+            for phrase in phrases:
+                if not candidates:
+                    break
+                candidates &= self.phrase_documents(phrase)
+        else:
+            candidates = set()
+            for word in set(words):
+                candidates.update(self.postings(word))
+
+        if self._length_norms is None:
+            self._length_norms = [K1 * (1 - B + B * length / self.average_length) for length in self.lengths]
+        scores = dict.fromkeys(candidates, 0.0)
+        for word in set(words):
+            idf = self.idf(word) * (K1 + 1)
+            postings = self.postings(word)
+            for doc_id in candidates:
+                frequency = postings.get(doc_id)
+                if frequency:
+                    scores[doc_id] += idf * frequency / (frequency + self._length_norms[doc_id])
+
+        ranked = heapq.nsmallest(limit, scores.items(), key=lambda item: (-item[1], item[0]))
+        return [(score,) + self.reference(doc_id) for doc_id, score in ranked]
+
+    ## (expansion_id, position in the expansion, card name, field) of a document
+    def reference(self, doc_id):
+        return self.expansion_ids[doc_id], self.positions[doc_id], self.card_names[doc_id], self.fields[doc_id]
+
+
+### Function description: loads the index file, building it from the pickled card list first if
+### it does not exist
+def load_or_build_index(index_path="card_search.index", pickle_path="full_card_list_file"):
+    if not os.path.exists(index_path):
+        with open(pickle_path, "rb") as file:
+            full_card_list = pickle.load(file)
+        SearchIndex.build(full_card_list).save(index_path)
+    return SearchIndex.load(index_path)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        sys.exit("Usage: python cardSearch.py <query> [index file]")
+    index = load_or_build_index(*sys.argv[2:3])
+    for score, expansion_id, position, card_name, field in index.search(sys.argv[1]):
+        print("{0:7.3f}  expansion {1}, card {2}: {3} ({4})".format(score, expansion_id, position, card_name, field))
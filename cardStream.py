@@ -0,0 +1,196 @@
+### Description: a streaming file format for the card list, so that consumers can go through the
+### cards one at a time instead of unpickling the whole of full_card_list_file first.
+###
+### The file starts with a header (a magic string and the number of expansions), followed by one
+### record per expansion marker and per card.  Every record is framed as a one-byte kind, a 4-byte
+### length and the payload; card payloads are the pickled card on its own.  The kind says which
+### class the card is, so cards filtered out by class or expansion are skipped with a seek and never
+### unpickled, and memory use stays at one card no matter how large the file grows.
+###
+### Usage: python cardStream.py [pickle file] [stream file]  (converts the pickle)
+
+from PokemonCardClasses import *
+import os
+import pickle
+import struct
+import sys
+
+MAGIC = b"PKMNCARDS1\n"
+HEADER = struct.Struct(">I")
+FRAME = struct.Struct(">cI")
+
+EXPANSION_RECORD = b"X"
+CARD_RECORDS = {"PokemonCard":b"P", "TrainerCard":b"T", "EnergyCard":b"E"}
+
+
+class CardStreamWriter():
+
+    ## The stream is written to a temporary file and renamed into place on close, so readers never
+    ## see a half-written stream
+    def __init__(self, path):
+        self.path = path
+        self.temp_path = path + ".tmp"
+        self.file = open(self.temp_path, "wb")
+        self.file.write(MAGIC + HEADER.pack(0))
+        self.expansion_count = 0
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, *exc_info):
+        if exc_type is None:
+            self.close()
+        else:
+            self.file.close()
+            os.remove(self.temp_path)
+
+    def __repr__(self):
+        return "CARD STREAM WRITER: {0}\n  {1} EXPANSIONS".format(self.path, self.expansion_count)
+
+    ## Function description: marks the start of the next expansion; the cards written after it
+    ## belong to it
+    def start_expansion(self):
+        self.file.write(FRAME.pack(EXPANSION_RECORD, 0))
+        self.expansion_count += 1
+
+    def write_card(self, card):
+        payload = pickle.dumps(card, pickle.HIGHEST_PROTOCOL)
+        self.file.write(FRAME.pack(CARD_RECORDS[type(card).__name__], len(payload)))
+        self.file.write(payload)
+
+    def write_expansion(self, expansion):
+        self.start_expansion()
+        for card in expansion:
+            self.write_card(card)
+
+    ## The expansion count in the header is filled in once all the expansions are written
+    def close(self):
+        self.file.seek(len(MAGIC))
+        self.file.write(HEADER.pack(self.expansion_count))
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.file.close()
+        os.replace(self.temp_path, self.path)
+
+
+### Function description: writes a card list (a list of expansions, each a list of cards) to a
+### stream file
+def write_card_stream(full_card_list, path):
+    with CardStreamWriter(path) as writer:
+        for expansion in full_card_list:
+            writer.write_expansion(expansion)
+
+
+### Function description: converts the existing pickled card list into a stream file
+def convert_pickle(pickle_path="full_card_list_file", stream_path="full_card_list.cards"):
+    with open(pickle_path, "rb") as file:
+        full_card_list = pickle.load(file)
+    write_card_stream(full_card_list, stream_path)
+    return stream_path
+
+
+class CardStream():
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            if not file.read(len(MAGIC)) == MAGIC:
+                raise ValueError("Not a card stream file: " + path)
+            self.expansion_count = HEADER.unpack(file.read(HEADER.size))[0]
+
+    def __repr__(self):
+        return "CARD STREAM: {0}\n  {1} EXPANSIONS".format(self.path, self.expansion_count)
+
+    ## Function description: yields (expansion_id, card) for every card, reading one record at a
+    ## time.  card_class (a class name or a collection of them) and expansions (a collection of
+    ## expansion ids, counting from 0) limit which cards are unpickled.
+    def iter_cards(self, card_class=None, expansions=None):
+        if isinstance(card_class, str):
+            card_class = (card_class,)
+        wanted_kinds = None if card_class is None else {CARD_RECORDS[name] for name in card_class}
+        if expansions is not None:
+            expansions = set(expansions)
+            last_expansion = max(expansions, default=-1)
+        with open(self.path, "rb", buffering=1024*1024) as file:
+            file.seek(len(MAGIC) + HEADER.size)
+            expansion_id = -1
+            while True:
+                frame = file.read(FRAME.size)
+                if len(frame) < FRAME.size:
+                    break
+                kind, length = FRAME.unpack(frame)
+                if kind == EXPANSION_RECORD:
+                    expansion_id += 1
+                    if expansions is not None and expansion_id > last_expansion:
+                        break
+                    continue
+                if (wanted_kinds is not None and kind not in wanted_kinds) or \
+                   (expansions is not None and expansion_id not in expansions):
+                    file.seek(length, os.SEEK_CUR)
+                    continue
+                yield expansion_id, pickle.loads(file.read(length))
+
+    ## Function description: yields (expansion_id, list of cards) one expansion at a time, with the
+    ## same filters as iter_cards().  Expansions left with no cards are still yielded, as empty
+    ## lists, unless an expansion filter leaves them out.
+    def iter_expansions(self, card_class=None, expansions=None):
+        expansion_ids = range(self.expansion_count) if expansions is None else sorted(set(expansions))
+        cards = self.iter_cards(card_class, expansions)
+        pending = next(cards, None)
+        for expansion_id in expansion_ids:
+            expansion = []
+            while pending is not None and pending[0] == expansion_id:
+                expansion.append(pending[1])
+                pending = next(cards, None)
+            yield expansion_id, expansion
+
+
+### The legacy pickle behind the same interface as CardStream, for when no stream file has been
+### written yet.  The whole card list has to be loaded to read it.
+class PickledCardList(CardStream):
+
+    def __init__(self, path):
+        self.path = path
+        with open(path, "rb") as file:
+            self.full_card_list = pickle.load(file)
+        self.expansion_count = len(self.full_card_list)
+
+    def __repr__(self):
+        return "PICKLED CARD LIST: {0}\n  {1} EXPANSIONS".format(self.path, self.expansion_count)
+
+    def iter_cards(self, card_class=None, expansions=None):
+        if isinstance(card_class, str):
+            card_class = (card_class,)
+        for expansion_id, expansion in enumerate(self.full_card_list):
+            if expansions is not None and expansion_id not in expansions:
+                continue
+            for card in expansion:
+                if card_class is None or type(card).__name__ in card_class:
+                    yield expansion_id, card
+
+
+### Function description: returns the path of the saved card list to read: the stream file if it
+### exists and is at least as new as the pickle, and otherwise the pickle (e.g. after a rip that
+### did not write a stream, the old stream is out of date)
+def card_list_path(stream_path="full_card_list.cards", pickle_path="full_card_list_file"):
+    if os.path.exists(stream_path) and \
+       (not os.path.exists(pickle_path) or os.path.getmtime(stream_path) >= os.path.getmtime(pickle_path)):
+        return stream_path
+    return pickle_path
+
+
+### Function description: opens the saved card list, as a stream if the stream file is up to date
+### and otherwise from the legacy pickle
+def open_card_list(stream_path="full_card_list.cards", pickle_path="full_card_list_file"):
+    if card_list_path(stream_path, pickle_path) == stream_path:
+        return CardStream(stream_path)
+    return PickledCardList(pickle_path)
+
+
+if __name__ == "__main__":
+    pickle_path = sys.argv[1] if len(sys.argv) > 1 else "full_card_list_file"
+    stream_path = sys.argv[2] if len(sys.argv) > 2 else "full_card_list.cards"
+    convert_pickle(pickle_path, stream_path)
+    stream = CardStream(stream_path)
+    print("Wrote {0} expansions, {1} cards to {2}".format(stream.expansion_count,
+          sum(1 for card in stream.iter_cards()), stream_path))
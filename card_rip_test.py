@@ -1,6 +1,55 @@
 from webscrapeFunctions import *
+import webscrapeFunctions
+from scrapeCheckpoint import ScrapeCheckpoint
+from scrapePipeline import CardPipeline
+from cardStream import write_card_stream
+from cardDedup import ReprintIndex
+from concurrent.futures import ThreadPoolExecutor
+import os
+import sys
 import pickle
 
+## Crawl settings: the number of card pages fetched in parallel, and the minimum number of
+## seconds between the start of two requests to serebii.net
+CONCURRENCY = int(os.environ.get("CONCURRENCY", "8"))
+POLITENESS_DELAY = float(os.environ.get("POLITENESS_DELAY", "0.1"))
+
+## Response cache settings: set CACHE_DIR to an empty string to disable the cache, and OFFLINE=1
+## to rip purely from pages cached by an earlier run
+CACHE_DIR = os.environ.get("CACHE_DIR", "serebii_cache")
+CACHE_MAX_MB = int(os.environ.get("CACHE_MAX_MB", "500"))
+CACHE_MAX_AGE_DAYS = float(os.environ.get("CACHE_MAX_AGE_DAYS", "30"))
+OFFLINE = os.environ.get("OFFLINE", "0") == "1"
+
+## Checkpoint settings: finished expansions are committed to CHECKPOINT_DIR (an empty string
+## disables checkpointing), and NEW_SETS_ONLY=1 re-checks the expansion listings and stops early if
+## there is nothing new to rip.  Checkpointed cards are only reused if they were parsed with the
+## current CARD_FORMAT_VERSION (see webscrapeFunctions.py); after a parser fix, bump it and the
+## expansions are parsed again, from the response cache where it has the pages.
+CHECKPOINT_DIR = os.environ.get("CHECKPOINT_DIR", "scrape_checkpoints")
+NEW_SETS_ONLY = os.environ.get("NEW_SETS_ONLY", "0") == "1"
+
+## Number of processes parsing card pages while CONCURRENCY threads download them; 0 parses in
+## the downloading threads instead
+PARSE_WORKERS = int(os.environ.get("PARSE_WORKERS", str(os.cpu_count() or 1)))
+
+## Card page parser: "full" (BeautifulSoup over the whole page) or "lxml" (XPath, then
+## BeautifulSoup over only the parts of the page that get used)
+PARSER_BACKEND = os.environ.get("PARSER_BACKEND", "full")
+
+## Page archives: RECORD_ARCHIVE appends every fetched page to the given file, and REPLAY_ARCHIVE
+## rips from a recorded file instead of the network
+RECORD_ARCHIVE = os.environ.get("RECORD_ARCHIVE", "")
+REPLAY_ARCHIVE = os.environ.get("REPLAY_ARCHIVE", "")
+
+## Card stream file written next to full_card_list_file, for readers that go through the cards one
+## at a time (see cardStream.py); an empty string disables it
+CARD_STREAM = os.environ.get("CARD_STREAM", "full_card_list.cards")
+
+## Reprint index (content hash -> first appearance and reprints, see cardDedup.py) written after
+## the rip; an empty string disables it
+REPRINT_INDEX = os.environ.get("REPRINT_INDEX", "reprint_index.json")
+
 ## Define the URLs
 BASE_URL = "http://www.serebii.net"
 SECTION_EXPANSIONS = "http://www.serebii.net/card/english.shtml"
@@ -27,50 +76,122 @@ IMAGE_DICT = {"/card/image/colorless.png":"C", "/card/colorless.png":"C",
                "/card/image/legend.png":"LEGEND", "/card/image/.png":"E",
                "/card/image/galactic.png":"Galactic"}
 
-## Get the list of all Pokémon species (to help determine whether a given
-## card is a Pokemon, Energy, or Trainer card).
-with open("pokemon_species.txt") as file:
-    pokemon_species = [line.strip("\n") for line in file]
+### Function description: rips a single card page and returns the matching card object
+def rip_card(link, pokemon_species):
+    print("RIPPING " + link)
+    return get_card(link, IMAGE_DICT, pokemon_species)
+
 
-## Get the links for the expansions and promotional sets
-expansion_list = get_expansion_links(BASE_URL, SECTION_EXPANSIONS)
-promo_list = get_expansion_links(BASE_URL, SECTION_PROMOS)
-expansion_list.extend(promo_list)
+### Function description: rips every card in every expansion.  Card pages within an expansion
+### are fetched in parallel by the executor's threads, but executor.map() hands the results back
+### in link order, so the output has the same expansion/card order as a sequential rip.  With a
+### pipeline (see scrapePipeline.py), the threads only download pages and parsing happens in
+### separate processes.  With a checkpoint, finished expansions are loaded instead of ripped,
+### cards journaled by an earlier run are not ripped again, and every expansion is committed as
+### soon as it is done.
+def rip_all_cards(expansion_list, pokemon_species, concurrency=CONCURRENCY, checkpoint=None, pipeline=None):
+    full_card_list = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for expansion_no, expansion in enumerate(expansion_list, 1):
+            progress = " (#{0}/{1})".format(expansion_no, len(expansion_list))
+            if checkpoint is not None and checkpoint.is_complete(expansion):
+                print("ALREADY RIPPED EXPANSION: " + expansion[1] + progress)
+                full_card_list.append(checkpoint.load_expansion(expansion))
+                continue
+            
+            ## For each expansion, get the list of links to access each card
+            print("NOW WORKING ON EXPANSION: " + expansion[1] + progress)
+            card_links = get_card_links(expansion[0], BASE_URL)
+            
+            ripped_cards = {}
+            record_card = None
+            if checkpoint is not None:
+                ripped_cards = checkpoint.journaled_cards(expansion)
+                record_card = lambda link, card: checkpoint.record_card(expansion, link, card)
+            
+            if pipeline is not None:
+                expansion_cards = pipeline.rip(card_links, ripped_cards, record_card)
+            else:
+                def rip_and_record(link):
+                    if link in ripped_cards:
+                        return ripped_cards[link]
+                    card = rip_card(link, pokemon_species)
+                    if record_card is not None:
+                        record_card(link, card)
+                    return card
+                expansion_cards = list(executor.map(rip_and_record, card_links))
+            
+            if checkpoint is not None:
+                checkpoint.commit_expansion(expansion, expansion_cards)
+            full_card_list.append(expansion_cards)
+    return full_card_list
 
-#expansion_list = [expansion_list[67]]
 
-full_card_list = []
+### Function description: gets the links for the expansions and promotional sets
+def get_all_expansions(listing_max_age=None):
+    expansion_list = get_expansion_links(BASE_URL, SECTION_EXPANSIONS, listing_max_age)
+    promo_list = get_expansion_links(BASE_URL, SECTION_PROMOS, listing_max_age)
+    expansion_list.extend(promo_list)
+    return expansion_list
 
-for expansion in expansion_list:
-    expansion_cards = []
+
+### Function description: the download half of rip_card(), used as the pipeline's fetch stage
+def fetch_card_page(link):
+    print("RIPPING " + link)
+    return fetch_html(link)
+
+
+if __name__ == "__main__":
+    configure_crawler(max_connections_per_host=CONCURRENCY, politeness_delay=POLITENESS_DELAY)
+    webscrapeFunctions.PARSER_BACKEND = PARSER_BACKEND
+    if CACHE_DIR:
+        enable_cache(CACHE_DIR, CACHE_MAX_MB*1024*1024, CACHE_MAX_AGE_DAYS*24*60*60, OFFLINE)
+    if RECORD_ARCHIVE:
+        enable_recording(RECORD_ARCHIVE)
+    if REPLAY_ARCHIVE:
+        enable_replay(REPLAY_ARCHIVE)
     
-    ## For each expansion, get the list of links to access each card
-    print("NOW WORKING ON EXPANSION: " + expansion[1] + " (#{0}/{1})".format(1+expansion_list.index(expansion), len(expansion_list)))
-    card_links = get_card_links(expansion[0], BASE_URL)
+    ## Get the list of all Pokémon species (to help determine whether a given
+    ## card is a Pokemon, Energy, or Trainer card).
+    with open("pokemon_species.txt") as file:
+        pokemon_species = [line.strip("\n") for line in file]
     
-    for link in card_links:
-        print("RIPPING " + link)
-        
-        ## Get the card types and rows
-        card_types = get_card_type(link)
-        card_rows = get_card_rows(link)
-        
-        ## Switching code - use card_types to figure out whether the link
-        ## is for a Trainer, Energy, or Pokemon card
-        if not card_types:
-            card = get_trainer(card_rows, IMAGE_DICT)
-            card.subtype = ["Trainer"]
-        elif card_types[0] in pokemon_species:
-            card = get_pokemon(card_rows, IMAGE_DICT, card_types)
-        elif card_types[0] == "Energy":
-            card = get_energy(card_rows, IMAGE_DICT)
-        else:
-            card = get_trainer(card_rows, IMAGE_DICT)
-            card.subtype = card_types
-        expansion_cards.append(card)
+    ## Get the links for the expansions and promotional sets; a new-sets-only refresh must not
+    ## trust a cached copy of the listings
+    expansion_list = get_all_expansions(0 if NEW_SETS_ONLY else None)
     
-    full_card_list.append(expansion_cards)
-
-## Open the target file and dump the card list to it
-with open("full_card_list_file","wb") as file:
-    pickle.dump(full_card_list, file)
\ No newline at end of file
+    #expansion_list = [expansion_list[67]]
+    
+    checkpoint = ScrapeCheckpoint(CHECKPOINT_DIR, CARD_FORMAT_VERSION) if CHECKPOINT_DIR else None
+    if checkpoint is not None:
+        new_expansions = checkpoint.new_expansions(expansion_list)
+        print("{0} OF {1} EXPANSIONS STILL TO RIP".format(len(new_expansions), len(expansion_list)))
+        for expansion in new_expansions:
+            print("  " + expansion[1])
+        if NEW_SETS_ONLY and not new_expansions and os.path.exists("full_card_list_file"):
+            sys.exit(0)
+    
+    if PARSE_WORKERS > 0:
+        with CardPipeline(IMAGE_DICT, pokemon_species, CONCURRENCY, PARSE_WORKERS,
+                          fetch=fetch_card_page, parser_backend=PARSER_BACKEND) as pipeline:
+            full_card_list = rip_all_cards(expansion_list, pokemon_species, checkpoint=checkpoint, pipeline=pipeline)
+    else:
+        full_card_list = rip_all_cards(expansion_list, pokemon_species, checkpoint=checkpoint)
+    
+    ## Open the target file and dump the card list to it
+    with open("full_card_list_file","wb") as file:
+        pickle.dump(full_card_list, file)
+    if CARD_STREAM:
+        write_card_stream(full_card_list, CARD_STREAM)
+    if REPRINT_INDEX:
+        reprint_index = ReprintIndex.build(full_card_list)
+        reprint_index.save(REPRINT_INDEX)
+        print(reprint_index)
+    
+    ## enable_cache() and configure_crawler() rebind the module globals, so the star-imported
+    ## copies are stale
+    if webscrapeFunctions.RESPONSE_CACHE is not None:
+        print(webscrapeFunctions.RESPONSE_CACHE)
+    if webscrapeFunctions.PAGE_RECORDER is not None:
+        webscrapeFunctions.PAGE_RECORDER.close()
+    print("REQUEST LATENCY: {0}".format(webscrapeFunctions.SESSION.latency_report()))
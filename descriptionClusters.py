@@ -0,0 +1,123 @@
+### Description: groups near-duplicate card texts (templated attack and ability descriptions that
+### differ only by a Pokémon name or a number) without comparing every pair of texts.  Each text
+### is cut into word shingles, summarized by a MinHash signature, and the signatures are split into
+### LSH bands; texts sharing a band bucket become candidates, and a candidate joins a cluster when
+### its signature agrees closely enough with the cluster's leader.  The work is roughly linear in
+### the number of distinct texts.
+###
+### Usage: python descriptionClusters.py  (prints the largest clusters of attack descriptions)
+
+from cardStream import open_card_list
+import difflib
+import numpy as np
+import re
+import zlib
+
+TOKEN = re.compile(r"\S+")
+
+## MinHash settings: NUM_PERMUTATIONS = BANDS * ROWS.  Texts with a Jaccard similarity of about
+## (1 / BANDS) ** (1 / ROWS) (~0.5 here) or more are likely to share a bucket, and a text joins a
+## cluster when its signature agrees with the leader's on at least THRESHOLD of the values.
+NUM_PERMUTATIONS = 64
+BANDS = 16
+ROWS = NUM_PERMUTATIONS // BANDS
+SHINGLE_SIZE = 3
+THRESHOLD = 0.6
+
+## Hashes are (a * x + b) mod a Mersenne prime, with x the CRC-32 of a shingle
+MERSENNE_PRIME = (1 << 61) - 1
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+
+### Function description: the set of word n-grams of a text; texts shorter than one shingle are a
+### single shingle of all their tokens
+def shingles(text, size=SHINGLE_SIZE):
+    tokens = tokenize(text)
+    if len(tokens) <= size:
+        return {" ".join(tokens)}
+    return {" ".join(tokens[n:n + size]) for n in range(len(tokens) - size + 1)}
+
+
+class MinHasher():
+
+    def __init__(self, num_permutations=NUM_PERMUTATIONS, seed=1):
+        generator = np.random.RandomState(seed)
+        ## a and b stay below 2**31 so that a * x + b cannot overflow 64 bits
+        self.a = generator.randint(1, 1 << 31, size=num_permutations).astype(np.uint64)
+        self.b = generator.randint(0, 1 << 31, size=num_permutations).astype(np.uint64)
+
+    def signature(self, text_shingles):
+        hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) for shingle in text_shingles),
+                             dtype=np.uint64, count=len(text_shingles))
+        return ((np.outer(self.a, hashes) + self.b[:, None]) % MERSENNE_PRIME).min(axis=1)
+
+
+### Function description: clusters texts given as {text: count}.  Texts are taken most common
+### first; each joins the cluster of the most similar cluster leader it shares an LSH bucket with,
+### if their signatures agree on at least threshold of their values, and otherwise becomes the
+### leader of a new cluster.  Comparing against leaders only keeps chains of slightly different
+### texts from merging into one huge cluster.  Returns a list of clusters, each a list of
+### (text, count) with the leader first, largest clusters (by total count) first; texts with no
+### near-duplicate come back as clusters of one.
+def cluster_texts(text_counts, threshold=THRESHOLD, bands=BANDS, minhasher=None):
+    texts = sorted((text for text in text_counts if text), key=lambda text: -text_counts[text])
+    if not texts:
+        return []
+    minhasher = minhasher if minhasher is not None else MinHasher()
+    signatures = np.array([minhasher.signature(shingles(text)) for text in texts])
+    rows = signatures.shape[1] // bands
+
+    ## One bucket table per band, holding only cluster leaders
+    buckets = [{} for band in range(bands)]
+    clusters = {}
+    for n, text in enumerate(texts):
+        keys = [signatures[n, band * rows:(band + 1) * rows].tobytes() for band in range(bands)]
+        candidates = {leader for band, key in enumerate(keys) for leader in buckets[band].get(key, ())}
+        best_leader, best_similarity = None, threshold
+        for leader in candidates:
+            similarity = np.mean(signatures[n] == signatures[leader])
+            if similarity >= best_similarity:
+                best_leader, best_similarity = leader, similarity
+        if best_leader is None:
+            clusters[n] = [(text, text_counts[text])]
+            for band, key in enumerate(keys):
+                buckets[band].setdefault(key, []).append(n)
+        else:
+            clusters[best_leader].append((text, text_counts[text]))
+    return sorted(clusters.values(), key=lambda cluster: -sum(count for text, count in cluster))
+
+
+### Function description: the cluster leader's text, with the words that are missing from at least
+### half of the other members replaced by "_"; at most max_members texts are compared
+def cluster_template(cluster, max_members=25):
+    template_tokens = tokenize(cluster[0][0])
+    matched_counts = [0] * len(template_tokens)
+    for text, count in cluster[1:max_members]:
+        matcher = difflib.SequenceMatcher(None, template_tokens, tokenize(text), autojunk=False)
+        for start, other_start, size in matcher.get_matching_blocks():
+            for n in range(start, start + size):
+                matched_counts[n] += 1
+    compared = len(cluster[1:max_members])
+    output = []
+    for token, matched in zip(template_tokens, matched_counts):
+        if 2 * matched < compared:
+            if not output or not output[-1] == "_":
+                output.append("_")
+        else:
+            output.append(token)
+    return " ".join(output)
+
+
+if __name__ == "__main__":
+    text_counts = {}
+    for expansion_id, card in open_card_list().iter_cards("PokemonCard"):
+        for attack in card.attacks:
+            description = attack.description.replace(card.name, "this Pokémon").lower()
+            text_counts[description] = text_counts.get(description, 0) + 1
+    clusters = cluster_texts(text_counts)
+    print("{0} distinct descriptions in {1} clusters\n".format(len(text_counts), len(clusters)))
+    for cluster in clusters[:20]:
+        print("{0:>5} uses, {1:>3} texts: {2}".format(sum(count for text, count in cluster), len(cluster), cluster_template(cluster)))
@@ -0,0 +1,78 @@
+### Description: replaces every mention of a set of names (e.g. all Pokémon species) in a piece of
+### text with a placeholder, in a single pass over the text.  All the names are compiled into one
+### regular expression shaped like a trie of the names (shared prefixes are matched once), and at
+### each position the longest name wins ("Mewtwo" rather than "Mew", "Porygon2" rather than
+### "Porygon") regardless of the order the names were listed in.
+
+import functools
+import re
+
+
+### Function description: builds a regular expression matching any of the names, as a trie.  A
+### name that is also the prefix of longer names becomes an optional (greedy) group, so the
+### longest name is tried first; sibling branches all start with different characters, so at most
+### one of them can match.
+def trie_pattern(names):
+    trie = {}
+    for name in names:
+        node = trie
+        for character in name:
+            node = node.setdefault(character, {})
+        node[""] = True
+
+    def node_pattern(node):
+        branches = [re.escape(character) + node_pattern(child) for character, child in sorted(node.items()) if character]
+        if not branches:
+            return ""
+        pattern = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            return "(?:" + pattern + ")?"
+        return pattern
+
+    return node_pattern(trie)
+
+
+class NameAnonymizer():
+
+    ## names is either a list of names that all get the same replacement, or a dictionary mapping
+    ## each name to its own replacement
+    def __init__(self, names, replacement="othermon"):
+        if isinstance(names, dict):
+            self.replacements = {name:text for name, text in names.items() if name}
+        else:
+            self.replacements = {name:replacement for name in names if name}
+        self.pattern = re.compile(trie_pattern(self.replacements))
+        ## With a single replacement text the substitution can skip the per-match lookup
+        if len(set(self.replacements.values())) == 1:
+            self.substitute = next(iter(self.replacements.values())).replace("\\", "\\\\")
+        else:
+            self.substitute = self._replace
+
+    def __repr__(self):
+        return "NAME ANONYMIZER: {0} NAMES".format(len(self.replacements))
+
+    def _replace(self, match):
+        return self.replacements[match.group(0)]
+
+    ## Function description: returns the text with every name replaced
+    def anonymize(self, text):
+        if not self.replacements:
+            return text
+        return self.pattern.sub(self.substitute, text)
+
+    def anonymize_lines(self, lines):
+        return [self.anonymize(line) for line in lines]
+
+
+### Function description: builds an anonymizer for every species listed in the species file
+def load_species_anonymizer(species_file="pokemon_species.txt", replacement="othermon"):
+    with open(species_file) as file:
+        pokemon_species = [species.strip() for species in file]
+    return NameAnonymizer(pokemon_species, replacement)
+
+
+### Function description: returns a (cached) anonymizer for a single name, e.g. for replacing a
+### card's own name in its text
+@functools.lru_cache(maxsize=4096)
+def name_replacer(name, replacement):
+    return NameAnonymizer([name], replacement)
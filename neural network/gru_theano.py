@@ -96,10 +96,92 @@ class GRUTheano:
         self.ce_error = theano.function([x, y], cost)
         self.bptt = theano.function([x, y], [dE, dU, dW, db, dV, dc])
         
+        # One step of the network at a time, for sampling: takes a word and the two hidden
+        # states after the previous word, returns the next word's probabilities and the new
+        # states, so each generated word costs one step instead of a scan over the whole prefix
+        x_t = T.iscalar('x_t')
+        s_t1 = T.vector('s_t1')
+        s_t2 = T.vector('s_t2')
+        self.predict_step = theano.function([x_t, s_t1, s_t2], forward_prop_step(x_t, s_t1, s_t2))
+        
         # SGD parameters
         learning_rate = T.scalar('learning_rate')
         decay = T.scalar('decay')
         
+        self.sgd_step = theano.function(
+            [x, y, learning_rate, theano.Param(decay, default=0.9)],
+            [], 
+            updates=self.rmsprop_updates([dE, dU, dW, dV, db, dc], learning_rate, decay))
+        
+    # Compiles ce_error_batch and sgd_step_batch, the minibatch versions of ce_error and sgd_step.
+    # They need a second scan and its gradient, so they are only built when minibatch training asks
+    # for them (see train.py), and only once.
+    def build_batch_functions(self):
+        if hasattr(self, 'sgd_step_batch'):
+            return
+        E, V, U, W, b, c = self.E, self.V, self.U, self.W, self.b, self.c
+        
+        # Minibatches: X, Y and mask are (time, batch) matrices, one sentence per column, with
+        # the shorter sentences padded at the end (with the <MASK/> index 0) and mask 0 there.
+        # Each scan step then multiplies the weights by a (hidden_dim, batch) matrix instead of
+        # a vector.
+        X = T.imatrix('X')
+        Y = T.imatrix('Y')
+        mask = T.matrix('mask')
+        
+        def forward_prop_batch_step(x_t, s_t1_prev, s_t2_prev):
+            # Word embedding layer, one column per sentence
+            x_e = E[:,x_t]
+            
+            # GRU Layer 1
+            z_t1 = T.nnet.hard_sigmoid(U[0].dot(x_e) + W[0].dot(s_t1_prev) + b[0].dimshuffle(0, 'x'))
+            r_t1 = T.nnet.hard_sigmoid(U[1].dot(x_e) + W[1].dot(s_t1_prev) + b[1].dimshuffle(0, 'x'))
+            c_t1 = T.tanh(U[2].dot(x_e) + W[2].dot(s_t1_prev * r_t1) + b[2].dimshuffle(0, 'x'))
+            s_t1 = (T.ones_like(z_t1) - z_t1) * c_t1 + z_t1 * s_t1_prev
+            
+            # GRU Layer 2
+            z_t2 = T.nnet.hard_sigmoid(U[3].dot(s_t1) + W[3].dot(s_t2_prev) + b[3].dimshuffle(0, 'x'))
+            r_t2 = T.nnet.hard_sigmoid(U[4].dot(s_t1) + W[4].dot(s_t2_prev) + b[4].dimshuffle(0, 'x'))
+            c_t2 = T.tanh(U[5].dot(s_t1) + W[5].dot(s_t2_prev * r_t2) + b[5].dimshuffle(0, 'x'))
+            s_t2 = (T.ones_like(z_t2) - z_t2) * c_t2 + z_t2 * s_t2_prev
+            
+            # Final output calculation, one row per sentence
+            o_t = T.nnet.softmax((V.dot(s_t2) + c.dimshuffle(0, 'x')).T)
+            
+            return [o_t, s_t1, s_t2]
+        
+        # Padding only comes after the end of a sentence, so it cannot change the states the
+        # real words see; masking the loss is enough to leave it out
+        [o_batch, s_batch, s2_batch], updates = theano.scan(
+            forward_prop_batch_step,
+            sequences=X,
+            truncate_gradient=self.bptt_truncate,
+            outputs_info=[None, 
+                          dict(initial=T.zeros((self.hidden_dim, X.shape[1]))),
+                          dict(initial=T.zeros((self.hidden_dim, X.shape[1])))])
+        
+        o_batch_error = T.sum(T.nnet.categorical_crossentropy(
+            o_batch.reshape((X.shape[0] * X.shape[1], self.word_dim)), Y.flatten()) * mask.flatten())
+        
+        # Averaged over the sentences, so a step is on the same scale as a per-sentence step
+        batch_cost = o_batch_error / T.cast(X.shape[1], theano.config.floatX)
+        
+        # SGD parameters
+        learning_rate = T.scalar('learning_rate')
+        decay = T.scalar('decay')
+        
+        self.ce_error_batch = theano.function([X, Y, mask], o_batch_error)
+        self.sgd_step_batch = theano.function(
+            [X, Y, mask, learning_rate, theano.Param(decay, default=0.9)],
+            [], 
+            updates=self.rmsprop_updates(T.grad(batch_cost, [E, U, W, V, b, c]), learning_rate, decay))
+        
+    # The rmsprop updates of the parameters and their caches, given the gradients in the order
+    # dE, dU, dW, dV, db, dc
+    def rmsprop_updates(self, gradients, learning_rate, decay):
+        E, V, U, W, b, c = self.E, self.V, self.U, self.W, self.b, self.c
+        dE, dU, dW, dV, db, dc = gradients
+        
         # rmsprop cache updates
         mE = decay * self.mE + (1 - decay) * dE ** 2
         mU = decay * self.mU + (1 - decay) * dU ** 2
@@ -108,22 +190,19 @@ class GRUTheano:
         mb = decay * self.mb + (1 - decay) * db ** 2
         mc = decay * self.mc + (1 - decay) * dc ** 2
         
-        self.sgd_step = theano.function(
-            [x, y, learning_rate, theano.Param(decay, default=0.9)],
-            [], 
-            updates=[(E, E - learning_rate * dE / T.sqrt(mE + 1e-6)),
-                     (U, U - learning_rate * dU / T.sqrt(mU + 1e-6)),
-                     (W, W - learning_rate * dW / T.sqrt(mW + 1e-6)),
-                     (V, V - learning_rate * dV / T.sqrt(mV + 1e-6)),
-                     (b, b - learning_rate * db / T.sqrt(mb + 1e-6)),
-                     (c, c - learning_rate * dc / T.sqrt(mc + 1e-6)),
-                     (self.mE, mE),
-                     (self.mU, mU),
-                     (self.mW, mW),
-                     (self.mV, mV),
-                     (self.mb, mb),
-                     (self.mc, mc)
-                    ])
+        return [(E, E - learning_rate * dE / T.sqrt(mE + 1e-6)),
+                (U, U - learning_rate * dU / T.sqrt(mU + 1e-6)),
+                (W, W - learning_rate * dW / T.sqrt(mW + 1e-6)),
+                (V, V - learning_rate * dV / T.sqrt(mV + 1e-6)),
+                (b, b - learning_rate * db / T.sqrt(mb + 1e-6)),
+                (c, c - learning_rate * dc / T.sqrt(mc + 1e-6)),
+                (self.mE, mE),
+                (self.mU, mU),
+                (self.mW, mW),
+                (self.mV, mV),
+                (self.mb, mb),
+                (self.mc, mc)
+               ]
         
         
     def calculate_total_loss(self, X, Y):
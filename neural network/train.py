@@ -16,6 +16,7 @@ NEPOCH = int(os.environ.get("NEPOCH", "2"))
 MODEL_OUTPUT_FILE = os.environ.get("MODEL_OUTPUT_FILE")
 INPUT_DATA_FILE = os.environ.get("INPUT_DATA_FILE", "card_texts.csv")
 PRINT_EVERY = int(os.environ.get("PRINT_EVERY", "100"))
+BATCH_SIZE = int(os.environ.get("BATCH_SIZE", "1"))      # 1 trains on one sentence at a time
 
 if not MODEL_OUTPUT_FILE:
   ts = datetime.now().strftime("%Y-%m-%d-%H-%M")
@@ -27,11 +28,40 @@ x_train, y_train, word_to_index, index_to_word = load_data(INPUT_DATA_FILE, VOCA
 # Build model
 model = GRUTheano(VOCABULARY_SIZE, hidden_dim=HIDDEN_DIM, bptt_truncate=-1)
 
+# Sentence generation (in sgd_callback) samples one step at a time; check it against the full scan
+if not predict_step_check_theano(model, x_train[10]):
+  sys.exit(1)
+
 # Print SGD step time
 t1 = time.time()
 model.sgd_step(x_train[10], y_train[10], LEARNING_RATE)
 t2 = time.time()
 print("SGD Step time: %f milliseconds" % ((t2 - t1) * 1000.))
+
+if BATCH_SIZE > 1:
+  model.build_batch_functions()
+  
+  # Check the masked minibatch loss against the per-sentence loss, on sentences spread over a
+  # range of lengths so the batch is padded
+  check = sorted(range(min(100, len(y_train))), key=lambda i: len(y_train[i]))[::33]
+  if not batch_loss_check_theano(model, [x_train[i] for i in check], [y_train[i] for i in check]):
+    sys.exit(1)
+  
+  # Compare the speed of the two paths on the same sentences (one length bucket); the steps are
+  # undone afterwards, so the benchmark does not change the model that is trained
+  state = get_model_state(model)
+  batch = make_minibatches(x_train, y_train, BATCH_SIZE)[0]
+  x_batch, y_batch, mask = pad_batch([x_train[i] for i in batch], [y_train[i] for i in batch])
+  num_tokens = mask.sum()
+  t1 = time.time()
+  for i in batch:
+    model.sgd_step(x_train[i], y_train[i], LEARNING_RATE)
+  t2 = time.time()
+  model.sgd_step_batch(x_batch, y_batch, mask, LEARNING_RATE)
+  t3 = time.time()
+  print("Per-sentence SGD: %.0f tokens/sec, minibatch SGD (%d sentences): %.0f tokens/sec" %
+    (num_tokens / (t2 - t1), len(batch), num_tokens / (t3 - t2)))
+  set_model_state(model, state)
 sys.stdout.flush()
 
 # We do this every few examples to understand what's going on
@@ -47,6 +77,10 @@ def sgd_callback(model, num_examples_seen):
   sys.stdout.flush()
 
 for epoch in range(NEPOCH):
-  train_with_sgd(model, x_train, y_train, learning_rate=LEARNING_RATE, nepoch=1, decay=0.9, 
-    callback_every=PRINT_EVERY, callback=sgd_callback)
+  if BATCH_SIZE > 1:
+    train_with_minibatch_sgd(model, x_train, y_train, batch_size=BATCH_SIZE, learning_rate=LEARNING_RATE,
+      nepoch=1, decay=0.9, callback_every=PRINT_EVERY, callback=sgd_callback)
+  else:
+    train_with_sgd(model, x_train, y_train, learning_rate=LEARNING_RATE, nepoch=1, decay=0.9, 
+      callback_every=PRINT_EVERY, callback=sgd_callback)
 
@@ -9,13 +9,18 @@ import sys
 import operator
 import io
 import array
+import theano
 from datetime import datetime
 from gru_theano import GRUTheano
 
+MASK_INDEX = 0
 SENTENCE_START_TOKEN = "CARD_START"
 SENTENCE_END_TOKEN = "CARD_END"
 UNKNOWN_TOKEN = "UNKNOWN_TOKEN"
 
+# The shared variables a training step updates: the parameters and their rmsprop caches
+MODEL_STATE = ['E', 'U', 'W', 'V', 'b', 'c', 'mE', 'mU', 'mW', 'mV', 'mb', 'mc']
+
 def load_data(filename="data/reddit-comments-2015-08.csv", vocabulary_size=2000, min_sent_characters=0):
 
     word_to_index = []
@@ -61,20 +66,80 @@ def load_data(filename="data/reddit-comments-2015-08.csv", vocabulary_size=2000,
     return X_train, y_train, word_to_index, index_to_word
 
 
+def print_speed(num_tokens, seconds):
+    print("Trained on %d tokens in %.1f seconds (%.0f tokens/sec)." % (num_tokens, seconds, num_tokens / seconds))
+    sys.stdout.flush()
+
 def train_with_sgd(model, X_train, y_train, learning_rate=0.001, nepoch=20, decay=0.9,
     callback_every=10000, callback=None):
     num_examples_seen = 0
     for epoch in range(nepoch):
+        num_tokens, train_time = 0, 0.
         # For each training example...
         for i in np.random.permutation(len(y_train)):
             # One SGD step
+            t1 = time.time()
             model.sgd_step(X_train[i], y_train[i], learning_rate, decay)
+            train_time += time.time() - t1
+            num_tokens += len(y_train[i])
             num_examples_seen += 1
             # Optionally do callback
             if (callback and callback_every and num_examples_seen % callback_every == 0):
                 callback(model, num_examples_seen)            
+        print_speed(num_tokens, train_time)
+    return model
+
+def pad_batch(X, Y):
+    # Pads the sentences at the end with the <MASK/> index and puts them in the columns of
+    # (time, batch) matrices; the mask is 1 for the real words and 0 for the padding
+    max_length = max(len(y) for y in Y)
+    x_batch = np.full((max_length, len(Y)), MASK_INDEX, dtype=np.int32)
+    y_batch = np.full((max_length, len(Y)), MASK_INDEX, dtype=np.int32)
+    mask = np.zeros((max_length, len(Y)), dtype=theano.config.floatX)
+    for j, (x, y) in enumerate(zip(X, Y)):
+        x_batch[:len(x), j] = x
+        y_batch[:len(y), j] = y
+        mask[:len(y), j] = 1.
+    return x_batch, y_batch, mask
+
+def make_minibatches(X_train, y_train, batch_size):
+    # Buckets the sentences by length, so a batch needs little padding: the sentences are sorted
+    # by length (in random order within a length) and cut into batches, and the batches shuffled
+    lengths = np.array([len(y) for y in y_train])
+    order = np.lexsort((np.random.random(len(lengths)), lengths))
+    batches = [order[i:i + batch_size] for i in range(0, len(order), batch_size)]
+    return [batches[i] for i in np.random.permutation(len(batches))]
+
+def train_with_minibatch_sgd(model, X_train, y_train, batch_size=32, learning_rate=0.001, nepoch=20,
+    decay=0.9, callback_every=10000, callback=None):
+    model.build_batch_functions()
+    num_examples_seen = 0
+    for epoch in range(nepoch):
+        num_tokens, train_time = 0, 0.
+        # For each minibatch...
+        for batch in make_minibatches(X_train, y_train, batch_size):
+            x_batch, y_batch, mask = pad_batch([X_train[i] for i in batch], [y_train[i] for i in batch])
+            # One SGD step
+            t1 = time.time()
+            model.sgd_step_batch(x_batch, y_batch, mask, learning_rate, decay)
+            train_time += time.time() - t1
+            num_tokens += int(mask.sum())
+            num_examples_seen += len(batch)
+            # Optionally do callback, whenever a multiple of callback_every examples is passed
+            if (callback and callback_every and
+                num_examples_seen // callback_every > (num_examples_seen - len(batch)) // callback_every):
+                callback(model, num_examples_seen)
+        print_speed(num_tokens, train_time)
     return model
 
+def get_model_state(model):
+    # Copies of everything a training step changes, e.g. to undo the steps of a benchmark
+    return dict((name, getattr(model, name).get_value()) for name in MODEL_STATE)
+
+def set_model_state(model, state):
+    for name in MODEL_STATE:
+        getattr(model, name).set_value(state[name])
+
 def save_model_parameters_theano(model, outfile):
     np.savez(outfile,
         E=model.E.get_value(),
@@ -146,6 +211,41 @@ def gradient_check_theano(model, x, y, h=0.001, error_threshold=0.01):
         print("Gradient check for parameter %s passed." % (pname))
 
 
+def batch_loss_check_theano(model, X, Y, error_threshold=1e-3):
+    # The masked loss of a padded minibatch must be the sum of the per-sentence losses; the
+    # sentences should have different lengths, so that the batch is padded
+    model.build_batch_functions()
+    x_batch, y_batch, mask = pad_batch(X, Y)
+    batch_loss = model.ce_error_batch(x_batch, y_batch, mask)
+    sentence_loss = model.calculate_total_loss(X, Y)
+    relative_error = np.abs(batch_loss - sentence_loss)/np.abs(sentence_loss)
+    if relative_error > error_threshold:
+        print("Batch Loss Check ERROR: lengths=%s" % [len(y) for y in Y])
+        print("Minibatch loss: %f" % batch_loss)
+        print("Per-sentence loss: %f" % sentence_loss)
+        print("Relative Error: %f" % relative_error)
+        return False
+    print("Batch loss check passed.")
+    return True
+
+
+def predict_step_check_theano(model, x, error_threshold=1e-5):
+    # Feeding the sentence to predict_step one word at a time, carrying the hidden states, must
+    # give the same distributions as predicting the whole sentence at once
+    o = model.predict(x)
+    s_t1 = np.zeros(model.hidden_dim, dtype=theano.config.floatX)
+    s_t2 = np.zeros(model.hidden_dim, dtype=theano.config.floatX)
+    for t, x_t in enumerate(x):
+        o_t, s_t1, s_t2 = model.predict_step(int(x_t), s_t1, s_t2)
+        max_error = np.max(np.abs(o_t - o[t]))
+        if max_error > error_threshold:
+            print("Predict Step Check ERROR: word=%d of %d" % (t, len(x)))
+            print("Maximum difference in probability: %g" % max_error)
+            return False
+    print("Predict step check passed.")
+    return True
+
+
 def print_sentence(s, index_to_word):
     sentence_str = [index_to_word[x] for x in s[1:-1]]
     print(" ".join(sentence_str))
@@ -154,9 +254,12 @@ def print_sentence(s, index_to_word):
 def generate_sentence(model, index_to_word, word_to_index, min_length=5):
     # We start the sentence with the start token
     new_sentence = [word_to_index[SENTENCE_START_TOKEN]]
+    # The hidden states after the words so far, carried from step to step
+    s_t1 = np.zeros(model.hidden_dim, dtype=theano.config.floatX)
+    s_t2 = np.zeros(model.hidden_dim, dtype=theano.config.floatX)
     # Repeat until we get an end token
     while not new_sentence[-1] == word_to_index[SENTENCE_END_TOKEN]:
-        next_word_probs = model.predict(new_sentence)[-1]
+        next_word_probs, s_t1, s_t2 = model.predict_step(int(new_sentence[-1]), s_t1, s_t2)
         samples = np.random.multinomial(1, next_word_probs)
         sampled_word = np.argmax(samples)
         new_sentence.append(sampled_word)
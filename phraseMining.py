@@ -0,0 +1,198 @@
+### Description: finds the rules text that recurs across the cards ("flip a coin. if heads, the
+### defending pokémon is now ...") without hand-written patterns.  Every attack, ability, Trainer
+### and Energy text is tokenized into one corpus, a suffix array is built over it by prefix
+### doubling (NumPy sorts, O(n log n) per round), and the LCP array turns it into the repeated
+### phrases of every length.  Only maximal repeats are reported: phrases that cannot be extended to
+### the left or right without losing an occurrence.  Each phrase comes with references to the cards
+### it appears on.
+###
+### Usage: python phraseMining.py [--min-length N] [--min-count N] [--limit N] [--references N]
+###                               [--order count|coverage]
+
+from cardStream import open_card_list
+import argparse
+import numpy as np
+import re
+import time
+
+TOKEN = re.compile(r"[\w']+|[^\w\s]")
+NO_SPACE_BEFORE = re.compile(r" ([.,;:!?)])")
+NO_SPACE_AFTER = re.compile(r"([(]) ")
+
+
+def tokenize(text):
+    return TOKEN.findall(text.lower())
+
+def detokenize(tokens):
+    return NO_SPACE_AFTER.sub(r"\1", NO_SPACE_BEFORE.sub(r"\1", " ".join(tokens)))
+
+
+### Function description: yields (expansion_id, position, card name, field, text) for every text on
+### every card, from (expansion_id, card) pairs such as CardStream.iter_cards().  A Pokémon's own
+### name is replaced with "this Pokémon", as elsewhere in the analyses.
+def iter_corpus(cards):
+    expansion_positions = {}
+    for expansion_id, card in cards:
+        position = expansion_positions.get(expansion_id, 0)
+        expansion_positions[expansion_id] = position + 1
+        if type(card).__name__ == "PokemonCard":
+            for ability, description in card.abilities.items():
+                yield expansion_id, position, card.name, "ability: " + ability, description.replace(card.name, "this Pokémon")
+            for attack in card.attacks:
+                yield expansion_id, position, card.name, "attack: " + attack.attack_name, attack.description.replace(card.name, "this Pokémon")
+        else:
+            yield expansion_id, position, card.name, "description", card.description
+
+
+### Function description: the suffix array of a sequence of non-negative integers, by prefix
+### doubling: suffixes are sorted by their first k tokens, then by their first 2k using the ranks
+### from the previous round, until every rank is distinct
+def suffix_array(sequence):
+    length = len(sequence)
+    rank = np.unique(sequence, return_inverse=True)[1].astype(np.int64)
+    order = np.argsort(rank, kind="stable")
+    step = 1
+    while True:
+        second = np.full(length, -1, dtype=np.int64)
+        second[:length - step] = rank[step:]
+        order = np.lexsort((second, rank))
+        sorted_rank, sorted_second = rank[order], second[order]
+        new_group = (sorted_rank[1:] != sorted_rank[:-1]) | (sorted_second[1:] != sorted_second[:-1])
+        rank = np.empty(length, dtype=np.int64)
+        rank[order] = np.concatenate(([0], np.cumsum(new_group)))
+        if rank[order[-1]] == length - 1 or step >= length:
+            return order
+        step *= 2
+
+
+### Function description: the LCP array (Kasai's algorithm): lcp[i] is the length of the common
+### prefix of the suffixes at suffix_order[i - 1] and suffix_order[i]; lcp[0] is 0
+def lcp_array(sequence, suffix_order):
+    length = len(sequence)
+    sequence = sequence.tolist()
+    suffix_rank = [0] * length
+    for n, suffix in enumerate(suffix_order.tolist()):
+        suffix_rank[suffix] = n
+    suffix_order = suffix_order.tolist()
+    lcp = [0] * length
+    common = 0
+    for suffix in range(length):
+        n = suffix_rank[suffix]
+        if n == 0:
+            common = 0
+            continue
+        previous = suffix_order[n - 1]
+        while suffix + common < length and previous + common < length and \
+              sequence[suffix + common] == sequence[previous + common]:
+            common += 1
+        lcp[n] = common
+        if common:
+            common -= 1
+    return lcp
+
+
+class PhraseMiner():
+
+    ## texts are (expansion_id, position, card name, field, text) as from iter_corpus().  Each text
+    ## is followed in the corpus by a separator token of its own, so no repeat can cross from one
+    ## text into the next.
+    def __init__(self, texts):
+        self.vocabulary = {}
+        self.words = []
+        self.references = []
+        token_ids, document_starts = [], []
+        for expansion_id, position, card_name, field, text in texts:
+            tokens = tokenize(text)
+            if not tokens:
+                continue
+            document_starts.append(len(token_ids))
+            for token in tokens:
+                token_id = self.vocabulary.get(token)
+                if token_id is None:
+                    token_id = self.vocabulary[token] = len(self.words)
+                    self.words.append(token)
+                token_ids.append(token_id)
+            token_ids.append(-1 - len(self.references))
+            self.references.append((expansion_id, position, card_name, field))
+        ## Separators get ids after the vocabulary, so all ids are non-negative
+        self.tokens = np.array(token_ids, dtype=np.int64)
+        self.tokens[self.tokens < 0] = len(self.words) - 1 - self.tokens[self.tokens < 0]
+        self.document_starts = np.array(document_starts, dtype=np.int64)
+
+        self.suffix_order = suffix_array(self.tokens)
+        self.lcp = lcp_array(self.tokens, self.suffix_order)
+        ## The token before each suffix (in suffix order), or a value of its own at the start of a
+        ## text, for telling whether a repeat can be extended to the left
+        previous = np.empty(len(self.tokens), dtype=np.int64)
+        previous[1:] = self.tokens[:-1]
+        previous[self.document_starts] = -1 - self.document_starts
+        previous[0] = -1
+        self.previous_tokens = previous[self.suffix_order]
+
+    def __repr__(self):
+        return "PHRASE MINER: {0} TEXTS, {1} TOKENS, {2} WORDS".format(len(self.references), len(self.tokens), len(self.words))
+
+    ## Function description: yields (length, first, last) for every LCP interval: the suffixes in
+    ## suffix_order[first:last + 1] share their first length tokens, and no wider interval does
+    def lcp_intervals(self):
+        stack = [(0, 0)]
+        for n in range(1, len(self.lcp) + 1):
+            common = self.lcp[n] if n < len(self.lcp) else 0
+            first = n - 1
+            while common < stack[-1][0]:
+                length, first = stack.pop()
+                yield length, first, n - 1
+            if common > stack[-1][0]:
+                stack.append((common, first))
+
+    ## Function description: returns the maximal repeated phrases of at least min_length tokens that
+    ## occur at least min_count times, as (phrase, occurrences, number of texts, start positions).
+    ## order "count" puts the most occurrences first; "coverage" ranks by occurrences times length
+    ## in tokens, which favours long templates over the short phrases inside them.
+    def maximal_phrases(self, min_length=4, min_count=5, order="count"):
+        phrases = []
+        for length, first, last in self.lcp_intervals():
+            count = last - first + 1
+            if length < min_length or count < min_count:
+                continue
+            previous = self.previous_tokens[first:last + 1]
+            if previous.min() == previous.max():
+                continue
+            starts = self.suffix_order[first:last + 1]
+            tokens = self.tokens[starts[0]:starts[0] + length]
+            documents = np.unique(np.searchsorted(self.document_starts, starts, side="right") - 1)
+            phrases.append((detokenize([self.words[token] for token in tokens]), count, len(documents), starts, length))
+        if order == "coverage":
+            phrases.sort(key=lambda phrase: (-phrase[1] * phrase[4], -phrase[1]))
+        else:
+            phrases.sort(key=lambda phrase: (-phrase[1], -phrase[4]))
+        return [phrase[:4] for phrase in phrases]
+
+    ## Function description: the (expansion_id, position, card name, field) of the texts a phrase
+    ## starts in, in card order
+    def phrase_references(self, starts, limit=None):
+        documents = np.unique(np.searchsorted(self.document_starts, starts, side="right") - 1)
+        return [self.references[document] for document in documents[:limit].tolist()]
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="The most frequent maximal phrases in the card texts.")
+    parser.add_argument("--min-length", type=int, default=4, help="shortest phrase, in tokens")
+    parser.add_argument("--min-count", type=int, default=5, help="fewest occurrences")
+    parser.add_argument("--limit", type=int, default=25, help="number of phrases to print")
+    parser.add_argument("--references", type=int, default=3, help="card references to print per phrase")
+    parser.add_argument("--order", choices=["count", "coverage"], default="count",
+                        help="rank by occurrences, or by occurrences times length")
+    arguments = parser.parse_args()
+
+    start_time = time.perf_counter()
+    miner = PhraseMiner(iter_corpus(open_card_list().iter_cards()))
+    build_time = time.perf_counter() - start_time
+    start_time = time.perf_counter()
+    phrases = miner.maximal_phrases(arguments.min_length, arguments.min_count, arguments.order)
+    mining_time = time.perf_counter() - start_time
+    print("{0}; suffix array in {1:.2f} s, {2} maximal phrases in {3:.2f} s\n".format(miner, build_time, len(phrases), mining_time))
+    for phrase, count, document_count, starts in phrases[:arguments.limit]:
+        print("{0} ({1} times in {2} texts)".format(phrase, count, document_count))
+        for expansion_id, position, card_name, field in miner.phrase_references(starts, arguments.references):
+            print("    expansion {0}, card {1}: {2} ({3})".format(expansion_id, position, card_name, field))
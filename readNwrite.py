@@ -3,72 +3,98 @@
 ### trainer cards, and energy cards, and writes them to specified, respective files.
 
 from PokemonCardClasses import *
+from nameAnonymizer import load_species_anonymizer, name_replacer
+from cardStream import open_card_list
+from cardDedup import unique_cards
+import os
 import pickle
 import re
 
-## Function description: shorthand for appending something to a file
-def append_to_file(object, target_file):
-    if not object[-1] == "." and not object[-1] == ")":
-        object += "."
-    with open(target_file, "a") as file:
-        file.write(object + "\n")
-
-def replace_name(text, name, cnt=0):
-    replace_text = "this Pokémon"
-    changed_text = re.sub(re.escape(name), replace_text, text, cnt)
-    return changed_text
-    #return text.replace(name, "this Pokémon")
-
-with open("full_card_list_file","rb") as file:
-    full_card_list = pickle.load(file)
-
-
+## Output files, one per kind of card text
 attack_text_file = "attack_text.txt"
 ability_text_file = "ability_text.txt"
 trainer_text_file = "trainer_text.txt"
 energy_text_file = "energy_text.txt"
 nn_pokemon_file = "card_texts.csv"
 
-for expansion in full_card_list:
-    expansion_no = full_card_list.index(expansion) + 1
-    expansion_text = "EXPANSION " + str(expansion_no) + " of " + str(len(full_card_list))
-    for card in expansion:
-        card_no = str(expansion.index(card) + 1)
-        print(expansion_text + ", CARD " + card_no + " of " + str(len(expansion)))
-        print(card.name)
-        card_class = type(card).__name__
-        if card_class == "TrainerCard":
-            append_to_file(card.description, trainer_text_file)
-        elif card_class == "EnergyCard":
-            append_to_file(card.description, energy_text_file)
-        elif card_class == "PokemonCard":
-            for ability in card.abilities:
-                ability_text = card.abilities[ability].replace(card.name, "this Pokémon")
-                #ability_text = replace_name(card.abilities[ability], card.name)
-                if ability_text:
-                    append_to_file(ability_text, ability_text_file)
-            for attack in card.attacks:
-                if attack.description:
-                    attack_text = attack.description.replace(card.name, "this Pokémon")
-                    #attack_text = replace_name(attack.description, card.name)
-                    append_to_file(attack_text, attack_text_file)
-            
-            with open(nn_pokemon_file, "a") as file:
-                file.write(card.nn_card() + "\n")
+## UNIQUE_ONLY=1 exports each card's text once, skipping reprints of cards seen earlier
+UNIQUE_ONLY = os.environ.get("UNIQUE_ONLY", "0") == "1"
+
+## Function description: formats a piece of card text as one line of an output file, making sure
+## it ends with punctuation
+def text_line(object):
+    if not object[-1] == "." and not object[-1] == ")":
+        object += "."
+    return object + "\n"
 
+def replace_name(text, name, cnt=0):
+    replace_text = "this Pokémon"
+    if cnt:
+        return re.sub(re.escape(name), replace_text, text, cnt)
+    return name_replacer(name, replace_text).anonymize(text)
+    #return text.replace(name, "this Pokémon")
 
-## Sometimes other Pokémon species get mentioned in the card texts; this replaces those
-## with a dummy word to try and reduce the vocabulary size.
-with open("card_texts.csv", 'r') as f:
-    card_texts = f.readlines()
+## Function description: yields (expansion number, number of expansions, card) for every card,
+## one at a time
+def iter_cards(full_card_list):
+    for expansion_no, expansion in enumerate(full_card_list, 1):
+        for card in expansion:
+            yield expansion_no, len(full_card_list), card
 
-with open("pokemon_species.txt") as g:
-    pokemon_species = g.readlines()
+## Function description: the same as iter_cards(), for a card list opened with open_card_list(), so
+## that only one card at a time is in memory when reading from the stream file.  With
+## unique_only, reprints are skipped.
+def iter_saved_cards(card_list, unique_only=False):
+    cards = card_list.iter_cards()
+    if unique_only:
+        cards = unique_cards(cards)
+    for expansion_id, card in cards:
+        yield expansion_id + 1, card_list.expansion_count, card
 
-pokemon_species = [species.strip() for species in pokemon_species]
+## Function description: writes the text of every card to the output files, keeping a single
+## buffered handle open per file for the whole export
+def export_card_texts(cards, buffer_size=1024*1024):
+    with open(attack_text_file, "a", buffering=buffer_size) as attack_file, \
+         open(ability_text_file, "a", buffering=buffer_size) as ability_file, \
+         open(trainer_text_file, "a", buffering=buffer_size) as trainer_file, \
+         open(energy_text_file, "a", buffering=buffer_size) as energy_file, \
+         open(nn_pokemon_file, "a", buffering=buffer_size) as nn_file:
+        current_expansion = None
+        for expansion_no, expansion_count, card in cards:
+            if not expansion_no == current_expansion:
+                current_expansion = expansion_no
+                print("EXPANSION " + str(expansion_no) + " of " + str(expansion_count))
+            card_class = type(card).__name__
+            if card_class == "TrainerCard":
+                trainer_file.write(text_line(card.description))
+            elif card_class == "EnergyCard":
+                energy_file.write(text_line(card.description))
+            elif card_class == "PokemonCard":
+                for ability in card.abilities:
+                    ability_text = card.abilities[ability].replace(card.name, "this Pokémon")
+                    #ability_text = replace_name(card.abilities[ability], card.name)
+                    if ability_text:
+                        ability_file.write(text_line(ability_text))
+                for attack in card.attacks:
+                    if attack.description:
+                        attack_text = attack.description.replace(card.name, "this Pokémon")
+                        #attack_text = replace_name(attack.description, card.name)
+                        attack_file.write(text_line(attack_text))
+                
+                nn_file.write(card.nn_card() + "\n")
 
-for mon in pokemon_species:
-    card_texts = [text.replace(mon, "othermon") for text in card_texts]
 
-with open("card_texts2.csv", 'w') as q:
-    q.writelines(card_texts)
\ No newline at end of file
+if __name__ == "__main__":
+    ## Reads full_card_list.cards if card_rip_test.py (or cardStream.py) has written it, and
+    ## otherwise falls back to the pickled card list
+    card_list = open_card_list("full_card_list.cards", "full_card_list_file")
+    export_card_texts(iter_saved_cards(card_list, UNIQUE_ONLY))
+    
+    
+    ## Sometimes other Pokémon species get mentioned in the card texts; this replaces those
+    ## with a dummy word to try and reduce the vocabulary size.
+    ## All species are matched in one pass per line, longest name first.
+    anonymizer = load_species_anonymizer("pokemon_species.txt", "othermon")
+    with open("card_texts.csv", 'r') as f, open("card_texts2.csv", 'w') as q:
+        for text in f:
+            q.write(anonymizer.anonymize(text))
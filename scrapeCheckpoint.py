@@ -0,0 +1,130 @@
+### Description: durable per-expansion checkpoints for the card rip, so that a crashed or
+### interrupted run can pick up where it left off instead of starting over.  Each finished expansion
+### is committed to its own pickle file; while an expansion is in progress, every ripped card is
+### appended to a journal file so that individual cards are not ripped twice either.
+###
+### Checkpoints are tied to the version of the parser that made the cards: committed expansions and
+### journals from another version count as not ripped, so a parser fix is never hidden behind
+### cards parsed the old way.
+
+import hashlib
+import json
+import os
+import pickle
+import threading
+
+
+class ScrapeCheckpoint():
+
+    def __init__(self, directory, version=None):
+        self.directory = directory
+        self.version = version
+        self.lock = threading.Lock()
+        self.journals = {}
+        os.makedirs(directory, exist_ok=True)
+        self.manifest_path = os.path.join(directory, "manifest.json")
+        self.manifest = {}
+        if os.path.exists(self.manifest_path):
+            with open(self.manifest_path, "r") as file:
+                self.manifest = json.load(file)
+
+    def __repr__(self):
+        output = "SCRAPE CHECKPOINT: {0}\n  {1} EXPANSIONS STORED"
+        return output.format(self.directory, len(self.manifest))
+
+    ## Expansions are identified by their URL; file names use its hash
+    def _key(self, expansion):
+        return hashlib.sha1(expansion[0].encode("utf-8")).hexdigest()
+
+    def _expansion_path(self, expansion):
+        return os.path.join(self.directory, self._key(expansion) + ".pickle")
+
+    def _journal_path(self, expansion):
+        return os.path.join(self.directory, self._key(expansion) + ".journal")
+
+    ## Writes the data to a temporary file, forces it to disk and then renames it into place, so
+    ## the target is either the old version or the complete new one
+    @staticmethod
+    def _write_durably(path, data):
+        temp_path = path + ".tmp"
+        with open(temp_path, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.replace(temp_path, path)
+
+    def is_complete(self, expansion):
+        return expansion[0] in self.manifest and self.manifest[expansion[0]].get("version") == self.version and \
+               os.path.exists(self._expansion_path(expansion))
+
+    ## Function description: returns the expansions in the listing that have not been committed yet
+    def new_expansions(self, expansion_list):
+        return [expansion for expansion in expansion_list if not self.is_complete(expansion)]
+
+    def load_expansion(self, expansion):
+        with open(self._expansion_path(expansion), "rb") as file:
+            return pickle.load(file)
+
+    ## Reads a journal up to its first damaged record; returns {card link: card} and the length of
+    ## the intact part.  The first record names the version the journal was written with; a journal
+    ## from another version has no intact part.
+    def _read_journal(self, journal_path):
+        cards = {}
+        good_length = 0
+        if not os.path.exists(journal_path):
+            return cards, good_length
+        with open(journal_path, "rb") as file:
+            try:
+                header = pickle.load(file)
+            except (EOFError, pickle.UnpicklingError, ValueError):
+                return cards, good_length
+            if not header == ("version", self.version):
+                return cards, good_length
+            good_length = file.tell()
+            while True:
+                try:
+                    link, card = pickle.load(file)
+                except (EOFError, pickle.UnpicklingError, ValueError):
+                    break
+                cards[link] = card
+                good_length = file.tell()
+        return cards, good_length
+
+    ## Function description: returns {card link: card} for the cards of an unfinished expansion
+    ## that were journaled by an earlier run.  A record cut short by a crash is ignored.
+    def journaled_cards(self, expansion):
+        return self._read_journal(self._journal_path(expansion))[0]
+
+    ## Function description: appends one ripped card to the expansion's journal.  Safe to call
+    ## from several crawler threads at once.
+    def record_card(self, expansion, link, card):
+        record = pickle.dumps((link, card))
+        with self.lock:
+            journal = self.journals.get(expansion[0])
+            if journal is None:
+                ## A record cut short by a crash is cut off first; records appended after it could
+                ## never be read back
+                journal_path = self._journal_path(expansion)
+                good_length = self._read_journal(journal_path)[1]
+                if os.path.exists(journal_path) and os.path.getsize(journal_path) > good_length:
+                    os.truncate(journal_path, good_length)
+                journal = open(journal_path, "ab")
+                if not good_length:
+                    journal.write(pickle.dumps(("version", self.version)))
+                self.journals[expansion[0]] = journal
+            journal.write(record)
+            journal.flush()
+
+    ## Function description: durably stores a finished expansion's cards (in card order), records it
+    ## in the manifest and drops its journal
+    def commit_expansion(self, expansion, cards):
+        self._write_durably(self._expansion_path(expansion), pickle.dumps(cards))
+        with self.lock:
+            self.manifest[expansion[0]] = {"name":expansion[1], "cards":len(cards), "version":self.version}
+            self._write_durably(self.manifest_path, json.dumps(self.manifest, indent=1).encode("utf-8"))
+            journal = self.journals.pop(expansion[0], None)
+            if journal is not None:
+                journal.close()
+        journal_path = self._journal_path(expansion)
+        if os.path.exists(journal_path):
+            os.remove(journal_path)
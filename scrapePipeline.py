@@ -0,0 +1,124 @@
+### Description: a two-stage card ripping pipeline.  Downloading card pages is I/O-bound and
+### parsing them with BeautifulSoup is CPU-bound, so the two are split: a pool of fetcher threads
+### streams raw HTML into a bounded queue, and a pool of worker processes (which do not share the
+### GIL) turns the HTML into card objects.  Results are put back into link order per expansion.
+
+from webscrapeFunctions import fetch_html, card_from_html
+from concurrent.futures import ProcessPoolExecutor
+import os
+import queue
+import threading
+
+
+## Parser settings for the worker processes, set once per process by _init_parse_worker() so they
+## do not have to be pickled along with every page
+_worker_settings = {}
+
+def _init_parse_worker(energy_dict, pokemon_species, parser_backend):
+    _worker_settings["energy_dict"] = energy_dict
+    _worker_settings["pokemon_species"] = frozenset(pokemon_species)
+    _worker_settings["parser_backend"] = parser_backend
+
+def _parse_card(html):
+    return card_from_html(html, _worker_settings["energy_dict"], _worker_settings["pokemon_species"],
+                          _worker_settings["parser_backend"])
+
+
+class CardPipeline():
+
+    ## fetchers is the number of download threads, parsers the number of parsing processes, and
+    ## max_pending bounds how many downloaded pages may wait for a parser.  When the parsers fall
+    ## behind, the queue fills up and the fetchers block until there is room again.  parser_backend
+    ## is passed on to parse_card_page() (None means the default backend).
+    def __init__(self, energy_dict, pokemon_species, fetchers=8, parsers=None, max_pending=64,
+                 fetch=fetch_html, parser_backend=None):
+        self.fetchers = fetchers
+        self.max_pending = max_pending
+        self.fetch = fetch
+        self.parse_pool = ProcessPoolExecutor(max_workers=parsers or os.cpu_count(),
+                                              initializer=_init_parse_worker,
+                                              initargs=(energy_dict, pokemon_species, parser_backend))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def close(self):
+        self.parse_pool.shutdown()
+
+    ## Fetcher thread body: takes (position, link) jobs until there are none left, and puts
+    ## (position, link, html or exception) on the page queue, blocking while it is full
+    def _fetch_worker(self, jobs, pages, stop):
+        while not stop.is_set():
+            try:
+                position, link = jobs.get_nowait()
+            except queue.Empty:
+                return
+            try:
+                result = self.fetch(link)
+            except Exception as error:
+                result = error
+            while not stop.is_set():
+                try:
+                    pages.put((position, link, result), timeout=0.1)
+                    break
+                except queue.Full:
+                    pass
+
+    ## Function description: rips the cards behind card_links and returns them in link order.
+    ## Cards already in ripped_cards ({link: card}) are reused instead of fetched, and on_card(link,
+    ## card) is called for every newly ripped card as soon as it is parsed.
+    def rip(self, card_links, ripped_cards=None, on_card=None):
+        ripped_cards = ripped_cards or {}
+        expansion_cards = [ripped_cards.get(link) for link in card_links]
+        jobs = queue.Queue()
+        for position, link in enumerate(card_links):
+            if link not in ripped_cards:
+                jobs.put((position, link))
+        job_count = jobs.qsize()
+        if not job_count:
+            return expansion_cards
+
+        pages = queue.Queue(maxsize=self.max_pending)
+        stop = threading.Event()
+        threads = [threading.Thread(target=self._fetch_worker, args=(jobs, pages, stop), daemon=True)
+                   for _ in range(min(self.fetchers, job_count))]
+        for thread in threads:
+            thread.start()
+
+        ## Hand every downloaded page to the parse pool; once max_pending parses are in flight,
+        ## wait for the oldest one before taking more pages off the queue
+        in_flight = []
+        try:
+            for _ in range(job_count):
+                position, link, html = pages.get()
+                if isinstance(html, Exception):
+                    raise html
+                in_flight.append((position, link, self.parse_pool.submit(_parse_card, html)))
+                if len(in_flight) >= self.max_pending:
+                    self._collect(in_flight.pop(0), expansion_cards, on_card)
+            for parse_job in in_flight:
+                self._collect(parse_job, expansion_cards, on_card)
+        except BaseException:
+            ## Nothing may finish (and reach on_card, e.g. a checkpoint) after a failure: the
+            ## fetchers are stopped and the parses that have not started are cancelled
+            stop.set()
+            for position, link, future in in_flight:
+                future.cancel()
+            self.parse_pool.shutdown(wait=False, cancel_futures=True)
+            raise
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join()
+        return expansion_cards
+
+    @staticmethod
+    def _collect(parse_job, expansion_cards, on_card):
+        position, link, future = parse_job
+        card = future.result()
+        expansion_cards[position] = card
+        if on_card is not None:
+            on_card(link, card)
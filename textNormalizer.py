@@ -0,0 +1,74 @@
+### Description: normalizes card text by swapping the parts that vary between otherwise identical
+### texts (damage amounts, numbers of coins, Special Conditions) for placeholders, so the texts can
+### be counted and compared.  All of a normalizer's rules are compiled into one regular expression,
+### so each text is rewritten in a single pass, and results are memoized since the same
+### descriptions come up again and again.
+###
+### The two rule sets reproduce the sequential re.sub passes text_analysis.py used to make, on
+### lower-cased text:
+###   ATTACK_TEXT_RULES  (Part 1) "[0-9]{1,2}0 damage|[1-9] damage counter(s)?" -> "_AMOUNT_ damage",
+###                      then "( _AMOUNT_ damage plus)? [0-9]{1,2}0 more damage" ->
+###                      " _AMOUNT_ more damage", then "flip [a1-9] coin(s)?" -> "flip _N_ coins",
+###                      then each Special Condition -> "_STATUS_"
+###   ATTACK_NAME_RULES  (Part 2) the same damage and coin rules, with "[0-9]{1,2}0 more damage" ->
+###                      "_AMOUNT_ more damage", and no Special Conditions
+### The second pass of Part 1 matched text produced by the first, so in one pass it becomes a rule
+### of its own for "<amount> damage plus <amount> more damage", tried before the others.  That rule
+### and the plain "<amount> more damage" one have the same replacement and are merged, and the
+### space they start with is checked with a lookbehind instead of being replaced.  The results are
+### the same as the sequential passes for any lower-case text (which cannot already contain the
+### upper-case placeholders).
+
+import re
+
+SPECIAL_CONDITIONS = ["asleep", "burned", "confused", "paralyzed", "poisoned"]
+
+AMOUNT_DAMAGE = "[0-9]{1,2}0 damage|[1-9] damage counters?"
+
+## Rules are (pattern, replacement) pairs.  Where two rules could match at the same position the
+## earlier one wins, as the earlier rule would have in the sequential passes.  The first
+## characters are every character a match can start with; the pattern skips other positions
+## without trying each rule there.
+ATTACK_TEXT_RULES = [("(?<= )(?:(?:" + AMOUNT_DAMAGE + ") plus )?[0-9]{1,2}0 more damage", "_AMOUNT_ more damage"),
+                     (AMOUNT_DAMAGE, "_AMOUNT_ damage"),
+                     ("flip [a1-9] coins?", "flip _N_ coins"),
+                     ("|".join(SPECIAL_CONDITIONS), "_STATUS_")]
+ATTACK_TEXT_FIRST_CHARACTERS = "0-9f" + "".join(sorted(set(status[0] for status in SPECIAL_CONDITIONS)))
+
+ATTACK_NAME_RULES = [(AMOUNT_DAMAGE, "_AMOUNT_ damage"),
+                     ("[0-9]{1,2}0 more damage", "_AMOUNT_ more damage"),
+                     ("flip [a1-9] coins?", "flip _N_ coins")]
+ATTACK_NAME_FIRST_CHARACTERS = "0-9f"
+
+
+class TextNormalizer():
+
+    def __init__(self, rules, first_characters=None):
+        self.replacements = [replacement for pattern, replacement in rules]
+        pattern = "|".join("({0})".format(rule_pattern) for rule_pattern, replacement in rules)
+        if first_characters:
+            pattern = "(?=[{0}])(?:{1})".format(first_characters, pattern)
+        self.pattern = re.compile(pattern)
+        self.cache = {}
+
+    def __repr__(self):
+        return "TEXT NORMALIZER: {0} RULES, {1} TEXTS CACHED".format(len(self.replacements), len(self.cache))
+
+    ## Each rule is one capturing group, and the rule patterns have no groups of their own
+    def _replace(self, match):
+        return self.replacements[match.lastindex - 1]
+
+    ## Function description: returns the normalized text, from the cache if it has been seen before
+    def normalize(self, text):
+        normalized = self.cache.get(text)
+        if normalized is None:
+            normalized = self.pattern.sub(self._replace, text)
+            self.cache[text] = normalized
+        return normalized
+
+
+def attack_text_normalizer():
+    return TextNormalizer(ATTACK_TEXT_RULES, ATTACK_TEXT_FIRST_CHARACTERS)
+
+def attack_name_normalizer():
+    return TextNormalizer(ATTACK_NAME_RULES, ATTACK_NAME_FIRST_CHARACTERS)
@@ -1,12 +1,36 @@
+### Description: statistics on the attack texts of the Pokémon cards.  All of the aggregates are
+### collected in one pass over the cards (AttackTextAnalysis), cached under a hash of the card data
+### so that re-running the reports on unchanged data skips the pass entirely, and written out as
+### the selected reports:
+###   attacks            how many attacks there are and how many have descriptions (Part 1a)
+###   top_descriptions   the ten most common attack descriptions (Part 1b)
+###   top_normalized     the same with damage, coin flips and Special Conditions made generic (Part 1c)
+###   clusters           the ten largest clusters of near-duplicate attack and ability texts, as
+###                      templates (see descriptionClusters.py)
+###   attack_names       attack names whose instances all share one description (Part 2), to
+###                      text_analysis.txt
+###   sda_list           the same list, to attack_descriptions.txt
+### Every report is appended to its file in the same format as before.
+###
+### With more than one worker, the pass is split up by expansion: runs of expansions are analyzed
+### in a process pool and the partial results merged in expansion order, which gives exactly the
+### serial result.
+###
+### Usage: python text_analysis.py [--reports REPORT ...] [--unique-only] [--no-cache] [--workers N]
+
 from collections import Counter
 from PokemonCardClasses import *
-import re
+from cardStream import open_card_list, card_list_path, CardStream, PickledCardList
+from cardDedup import unique_cards, card_hash
+from concurrent.futures import ProcessPoolExecutor
+from textNormalizer import attack_text_normalizer, attack_name_normalizer
+from descriptionClusters import cluster_texts, cluster_template
+import argparse
+import hashlib
+import os
 import pickle
+import re
 
-def read_text_file(filename):
-    with open(filename, "r") as file:
-        lines = file.readlines()
-    return lines
 
 def replace_name(text, name):
     replace_text = "this Pokémon"
@@ -15,127 +39,264 @@ def replace_name(text, name):
 
 
 TARGET_FILE = "text_analysis.txt"
-
-with open("full_card_list_file","rb") as file:
-    full_card_list = pickle.load(file)
-
-
-
-## PART 1: ATTACK TEXT ANALYSIS
-
-attack_text = read_text_file("attack_text.txt")
-attack_text = [attack.lower() for attack in attack_text]
-
-attack_text = []
-full_attack_list = []
-type_attack_list = []
-for expansion in full_card_list:
-    for card in expansion:
-        if type(card).__name__ == "PokemonCard":
-            for attack in card.attacks:
-                attack.description = attack.description.replace(card.name, "this Pokémon")
-                #attack.description = replace_name(attack.description, card.name)
-                if attack.description and not attack.description[-1] == ".":
-                    attack.description += "."
-                full_attack_list.append(attack)
-                type_attack_list.extend((card.type, card.attacks))
-            
-
-
-### Part 1a: See how many attacks have additional descriptions.
-
-## Start by getting all of the attack texts into a list; we want lower-case in case of 
-attack_text = []
-for attack in full_attack_list:
-    if attack.description:
-        attack_text.append(attack.description.lower())
-
-number_of_attacks = len(full_attack_list)
-number_of_descriptions = len(attack_text)
-percent_with_descriptions = 100 * number_of_descriptions/number_of_attacks
-
-
-## Part 1b: Check for attack descriptions, see how many totally unique ones there are.
-attack_counter = Counter(attack_text)
-top_ten_attacks = attack_counter.most_common(10)
-top_ten_list = [txt.strip()+" ("+str(cntr) + ")\n" for txt,cntr in top_ten_attacks]
-
-
-## Part 1c: Check for attack descriptions, see if replacing the damage/number of coins/status with dummy strings changes anything
-attack_text_2 = [re.sub("[0-9]{1,2}0 damage|[1-9] damage counter(s)?", "_AMOUNT_ damage", attack) for attack in attack_text]
-attack_text_2 = [re.sub("( _AMOUNT_ damage plus)? [0-9]{1,2}0 more damage", " _AMOUNT_ more damage", attack) for attack in attack_text_2]
-attack_text_2 = [re.sub("flip [a1-9] coin(s)?", "flip _N_ coins", attack) for attack in attack_text_2]
-
-special_conditions = ["asleep", "burned", "confused", "paralyzed", "poisoned"]
-for status in special_conditions:
-    #attack_text_2 = [re.sub(status, "_STATUS_", attack) for attack in attack_text_2]
-    attack_text_2 = [attack.replace(status, "_STATUS_") for attack in attack_text_2]
-
-attack_counter_2 = Counter(attack_text_2)
-top_ten_attacks_2 = attack_counter_2.most_common(10)
-top_ten_list_2 = [txt.strip()+" ("+str(cntr) + ")\n" for txt,cntr in top_ten_attacks_2]
-
-
-## Write the necessary information to a file for storage
-with open(TARGET_FILE, "a") as file:
-    file.write("Total number of attacks: " + str(number_of_attacks) + "\n")
-    file.write("Number of attacks with descriptions: " + str(number_of_descriptions) + "\n")
-    file.write("Percentage of attacks with descriptions: {:.2f}% \n \n".format(percent_with_descriptions))
-
-    file.write("Top 10 attack descriptions: \n")
-    for item in top_ten_list:
-        file.write(item)
-    file.write("\n")
-
-    file.write("Top 10 descriptions with generic damage/coin flips/status: \n")
-    for item in top_ten_list_2:
-        file.write(item)
-    file.write("\n \n")
-        
-
-
-## PART 2: ATTACK NAMES VS DESCRIPTIONS
-
-attack_name_descriptions = {}
-for attack in full_attack_list:
-    name = attack.attack_name
-    description = attack.description.lower()
-    description = re.sub("[0-9]{1,2}0 damage|[1-9] damage counter(s)?", "_AMOUNT_ damage", description)
-    description = re.sub("[0-9]{1,2}0 more damage", "_AMOUNT_ more damage", description)
-    description = re.sub("flip [a1-9] coin(s)?", "flip _N_ coins", description)
-    if name in attack_name_descriptions:
-        attack_name_descriptions[name].append(description)
+SDA_FILE = "attack_descriptions.txt"
+CARD_STREAM_FILE = "full_card_list.cards"
+CARD_PICKLE_FILE = "full_card_list_file"
+
+## UNIQUE_ONLY=1 counts each card once, skipping reprints of cards seen earlier
+UNIQUE_ONLY = os.environ.get("UNIQUE_ONLY", "0") == "1"
+
+## Cached analyses go in ANALYSIS_CACHE_DIR; bump ANALYSIS_VERSION whenever what gets collected
+## changes, so that older cached results are not reused
+ANALYSIS_CACHE_DIR = os.environ.get("ANALYSIS_CACHE_DIR", "analysis_cache")
+ANALYSIS_VERSION = 2
+
+## Number of processes the analysis is split over (by expansion); 1 runs it serially
+ANALYSIS_WORKERS = int(os.environ.get("ANALYSIS_WORKERS", str(os.cpu_count() or 1)))
+
+
+### Function description: the attack description as the analysis sees it: the card's own name
+### replaced with "this Pokémon", and a full stop added if it does not end with one
+def attack_description(attack, card):
+    description = attack.description.replace(card.name, "this Pokémon")
+    #description = replace_name(attack.description, card.name)
+    if description and not description[-1] == ".":
+        description += "."
+    return description
+
+
+### All of the aggregates the reports are made from.  Counters keep the order in which texts were
+### first seen, so ties in the rankings come out in card order.
+class AttackTextAnalysis():
+
+    def __init__(self):
+        self.number_of_attacks = 0
+        ## lower-cased descriptions, and the same normalized, for attacks that have one
+        self.description_counts = Counter()
+        self.normalized_counts = Counter()
+        ## attack name -> Counter of its (lower-cased, normalized) descriptions, empty ones included
+        self.name_descriptions = {}
+        ## lower-cased ability texts, with the card's name replaced as for attacks
+        self.ability_counts = Counter()
+
+    def __repr__(self):
+        output = "ATTACK TEXT ANALYSIS: {0} ATTACKS, {1} DESCRIPTIONS, {2} NAMES"
+        return output.format(self.number_of_attacks, sum(self.description_counts.values()), len(self.name_descriptions))
+
+    def add_card(self, card, text_normalizer, name_normalizer):
+        for attack in card.attacks:
+            description = attack_description(attack, card).lower()
+            self.number_of_attacks += 1
+            if description:
+                self.description_counts[description] += 1
+                self.normalized_counts[text_normalizer.normalize(description)] += 1
+            name_counts = self.name_descriptions.get(attack.attack_name)
+            if name_counts is None:
+                name_counts = self.name_descriptions[attack.attack_name] = Counter()
+            name_counts[name_normalizer.normalize(description)] += 1
+        for ability_text in card.abilities.values():
+            ability_text = ability_text.replace(card.name, "this Pokémon").lower()
+            if ability_text:
+                self.ability_counts[ability_text] += 1
+
+    ## Function description: adds the counts of an analysis of the cards that come after these
+    def merge(self, other):
+        self.number_of_attacks += other.number_of_attacks
+        self.description_counts.update(other.description_counts)
+        self.normalized_counts.update(other.normalized_counts)
+        self.ability_counts.update(other.ability_counts)
+        for name, name_counts in other.name_descriptions.items():
+            if name in self.name_descriptions:
+                self.name_descriptions[name].update(name_counts)
+            else:
+                self.name_descriptions[name] = Counter(name_counts)
+
+    ## Function description: the attack names whose instances all have the same description ('SDA'
+    ## is short for 'single description attack'), as (name, number of instances, description),
+    ## most instances first
+    def single_description_attacks(self):
+        SDAs = [(name, sum(name_counts.values()), next(iter(name_counts)))
+                for name, name_counts in self.name_descriptions.items()
+                if len(name_counts) == 1 and sum(name_counts.values()) > 1]
+        return sorted(SDAs, key=lambda SDA: SDA[1], reverse=True)
+
+
+### Function description: runs the analysis over (expansion_id, card) pairs in a single pass
+def analyze_cards(cards):
+    analysis = AttackTextAnalysis()
+    text_normalizer = attack_text_normalizer()
+    name_normalizer = attack_name_normalizer()
+    for expansion_id, card in cards:
+        analysis.add_card(card, text_normalizer, name_normalizer)
+    return analysis
+
+
+### Map-reduce version of analyze_cards().  A chunk is a run of consecutive expansions, given either
+### as the path of a card stream plus the expansion ids (the worker reads just those expansions)
+### or, for the legacy pickle, as the (expansion_id, card) pairs themselves.
+
+## Yields (expansion_id, number of the Pokémon card within its expansion, card)
+def _iter_chunk(chunk):
+    source, expansion_ids = chunk
+    cards = CardStream(source).iter_cards("PokemonCard", expansion_ids) if isinstance(source, str) else source
+    counts = {}
+    for expansion_id, card in cards:
+        number = counts.get(expansion_id, 0)
+        counts[expansion_id] = number + 1
+        yield expansion_id, number, card
+
+## Map step for unique_only: the content hash of every card in the chunk, in order
+def _hash_chunk(chunk):
+    return [((expansion_id, number), card_hash(card)) for expansion_id, number, card in _iter_chunk(chunk)]
+
+## Map step: the analysis of the chunk, leaving out the cards in skipped (reprints)
+def _analyze_chunk(chunk, skipped):
+    return analyze_cards((expansion_id, card) for expansion_id, number, card in _iter_chunk(chunk)
+                         if (expansion_id, number) not in skipped)
+
+### Function description: the same analysis as analyze_cards() over a saved card list, computed
+### in a process pool; the card list is split into runs of consecutive expansions, several per
+### worker, and the partial analyses are merged in expansion order
+def analyze_in_parallel(card_list, workers, unique_only=False):
+    expansion_ids = list(range(card_list.expansion_count))
+    chunk_count = min(len(expansion_ids), 4 * workers) or 1
+    bounds = [len(expansion_ids) * n // chunk_count for n in range(chunk_count + 1)]
+    expansion_chunks = [expansion_ids[bounds[n]:bounds[n + 1]] for n in range(chunk_count)]
+    if isinstance(card_list, PickledCardList):
+        chunks = [(list(card_list.iter_cards("PokemonCard", set(chunk))), chunk) for chunk in expansion_chunks]
     else:
-        attack_name_descriptions[name] = [description]
-
-num_unique_names = len(attack_name_descriptions)
-
-
-## Note: 'SDA' is short for 'single description attack'
-SDAs = {}
-unique_attack_descriptions = {}
-SDA_counts = {}
-for name in attack_name_descriptions:
-    and_name = attack_name_descriptions[name]
-    attack_descriptions = Counter(and_name)
-    unique_attack_descriptions[name] = set(attack_descriptions)
-    description_count =  len(attack_descriptions)
-    if description_count == 1 and len(and_name) > 1:
-        SDAs[name] = list(attack_descriptions.keys())[0]
-        SDA_counts[name] = len(and_name)
-
-ranked_names = sorted(SDA_counts, key=SDA_counts.get, reverse=True)
-
-
-
-with open("attack_descriptions.txt", "a") as file:
-    for name in ranked_names:
-        file.write("There are " + str(SDA_counts[name]) + " instances of the attack " + name + ":\n" + SDAs[name] + "\n")
-
-with open(TARGET_FILE, "a") as file:
-    file.write("Number of unique attack names: " + str(num_unique_names) + "\n")
-    file.write("Number of unique attack names where all instances have the same description: " + str(len(SDAs)) + "\n\n")
-    file.write("Top 10 unique attacks with unique descriptions: \n")
-    for name in ranked_names:
-        file.write("There are " + str(SDA_counts[name]) + " instances of the attack " + name + "\n Description:" + SDAs[name] + "\n")
-    file.write("\n \n")
+        chunks = [(card_list.path, chunk) for chunk in expansion_chunks]
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ## Reprints are found from the hashes in card order, as unique_cards() would find them
+        skipped = [set() for chunk in chunks]
+        if unique_only:
+            seen = set()
+            for chunk_skipped, chunk_hashes in zip(skipped, pool.map(_hash_chunk, chunks)):
+                for key, content_hash in chunk_hashes:
+                    if content_hash in seen:
+                        chunk_skipped.add(key)
+                    seen.add(content_hash)
+        analysis = AttackTextAnalysis()
+        for partial in pool.map(_analyze_chunk, chunks, skipped):
+            analysis.merge(partial)
+    return analysis
+
+
+### Function description: hashes the saved card data, together with the settings that change the
+### analysis, to key the cache
+def card_data_key(source_path, unique_only):
+    digest = hashlib.sha1("{0}:{1}:".format(ANALYSIS_VERSION, int(unique_only)).encode("utf-8"))
+    with open(source_path, "rb") as file:
+        for block in iter(lambda: file.read(1024*1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+### Function description: returns the analysis of the saved card list, from the cache if the card
+### data has not changed since it was stored.  cache_dir=None neither reads nor writes the cache.
+def load_analysis(unique_only=UNIQUE_ONLY, cache_dir=ANALYSIS_CACHE_DIR,
+                  stream_path=CARD_STREAM_FILE, pickle_path=CARD_PICKLE_FILE, workers=1):
+    source_path = card_list_path(stream_path, pickle_path)
+    if cache_dir is not None:
+        cache_path = os.path.join(cache_dir, card_data_key(source_path, unique_only) + ".pickle")
+        if os.path.exists(cache_path):
+            with open(cache_path, "rb") as file:
+                return pickle.load(file)
+
+    ## The cards are read one at a time from the card stream if it exists, and otherwise from the
+    ## pickled card list
+    card_list = open_card_list(stream_path, pickle_path)
+    if workers > 1:
+        analysis = analyze_in_parallel(card_list, workers, unique_only)
+    else:
+        cards = card_list.iter_cards("PokemonCard")
+        if unique_only:
+            cards = unique_cards(cards)
+        analysis = analyze_cards(cards)
+
+    if cache_dir is not None:
+        os.makedirs(cache_dir, exist_ok=True)
+        with open(cache_path + ".tmp", "wb") as file:
+            pickle.dump(analysis, file, pickle.HIGHEST_PROTOCOL)
+        os.replace(cache_path + ".tmp", cache_path)
+    return analysis
+
+
+### Reports: each takes the analysis and returns the text to append to its file
+
+def attacks_report(analysis):
+    number_of_descriptions = sum(analysis.description_counts.values())
+    percent_with_descriptions = 100 * number_of_descriptions/analysis.number_of_attacks
+    output = "Total number of attacks: " + str(analysis.number_of_attacks) + "\n"
+    output += "Number of attacks with descriptions: " + str(number_of_descriptions) + "\n"
+    output += "Percentage of attacks with descriptions: {:.2f}% \n \n".format(percent_with_descriptions)
+    return output
+
+def top_descriptions_report(analysis):
+    output = "Top 10 attack descriptions: \n"
+    for txt, cntr in analysis.description_counts.most_common(10):
+        output += txt.strip()+" ("+str(cntr) + ")\n"
+    return output + "\n"
+
+def top_normalized_report(analysis):
+    output = "Top 10 descriptions with generic damage/coin flips/status: \n"
+    for txt, cntr in analysis.normalized_counts.most_common(10):
+        output += txt.strip()+" ("+str(cntr) + ")\n"
+    return output + "\n \n"
+
+def clusters_report(analysis):
+    text_counts = Counter(analysis.description_counts)
+    text_counts.update(analysis.ability_counts)
+    output = "Top 10 clusters of near-duplicate attack and ability texts: \n"
+    for cluster in cluster_texts(text_counts)[:10]:
+        uses = sum(count for text, count in cluster)
+        output += cluster_template(cluster) + " (" + str(uses) + " uses, " + str(len(cluster)) + " texts)\n"
+    return output + "\n \n"
+
+def sda_list_report(analysis):
+    output = ""
+    for name, count, description in analysis.single_description_attacks():
+        output += "There are " + str(count) + " instances of the attack " + name + ":\n" + description + "\n"
+    return output
+
+def attack_names_report(analysis):
+    SDAs = analysis.single_description_attacks()
+    output = "Number of unique attack names: " + str(len(analysis.name_descriptions)) + "\n"
+    output += "Number of unique attack names where all instances have the same description: " + str(len(SDAs)) + "\n\n"
+    output += "Top 10 unique attacks with unique descriptions: \n"
+    for name, count, description in SDAs:
+        output += "There are " + str(count) + " instances of the attack " + name + "\n Description:" + description + "\n"
+    return output + "\n \n"
+
+## Report name -> (function, output file), in the order the reports are written
+REPORTS = {"attacks":(attacks_report, TARGET_FILE),
+           "top_descriptions":(top_descriptions_report, TARGET_FILE),
+           "top_normalized":(top_normalized_report, TARGET_FILE),
+           "clusters":(clusters_report, TARGET_FILE),
+           "sda_list":(sda_list_report, SDA_FILE),
+           "attack_names":(attack_names_report, TARGET_FILE)}
+
+
+### Function description: appends the selected reports to their files, in REPORTS order
+def write_reports(analysis, report_names):
+    for report_name, (report, filename) in REPORTS.items():
+        if report_name in report_names:
+            with open(filename, "a") as file:
+                file.write(report(analysis))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Statistics on the attack texts of the Pokémon cards.")
+    parser.add_argument("--reports", nargs="+", choices=list(REPORTS), default=list(REPORTS),
+                        help="the reports to write (default: all of them)")
+    parser.add_argument("--unique-only", action="store_true", default=UNIQUE_ONLY,
+                        help="count each card once, skipping reprints (same as UNIQUE_ONLY=1)")
+    parser.add_argument("--no-cache", action="store_true", help="always redo the analysis")
+    parser.add_argument("--workers", type=int, default=ANALYSIS_WORKERS,
+                        help="processes to split the analysis over, by expansion (same as ANALYSIS_WORKERS)")
+    arguments = parser.parse_args()
+
+    analysis = load_analysis(arguments.unique_only, None if arguments.no_cache else ANALYSIS_CACHE_DIR,
+                             workers=arguments.workers)
+    write_reports(analysis, arguments.reports)
@@ -0,0 +1,84 @@
+### Description: record/replay of scraped pages.  During a rip, every page fetched can be appended
+### to a compressed archive file (one gzip member per page, each holding a small WARC-style header
+### followed by the page body), and later rips or benchmarks can be served entirely from that
+### archive without touching serebii.net.
+
+import gzip
+import threading
+import time
+
+
+### Raised when replaying an archive that does not contain the requested URL
+class ArchiveMiss(Exception):
+    pass
+
+
+class PageArchiveWriter():
+
+    def __init__(self, path):
+        self.path = path
+        self.lock = threading.Lock()
+        self.recorded = set()
+        self.file = open(path, "ab")
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    ## Appends one page as its own gzip member.  Pages already recorded in this session are
+    ## skipped, so a URL fetched twice is only stored once.
+    def record(self, url, body):
+        header = "URL: {0}\nContent-Length: {1}\nFetched: {2:.0f}\n\n".format(url, len(body), time.time())
+        member = gzip.compress(header.encode("utf-8") + body + b"\n\n")
+        with self.lock:
+            if url in self.recorded:
+                return
+            self.recorded.add(url)
+            self.file.write(member)
+            self.file.flush()
+
+    def close(self):
+        with self.lock:
+            self.file.close()
+
+
+class PageArchive():
+
+    ## Reads a whole archive into memory; if a URL was recorded more than once, the last copy wins
+    def __init__(self, path):
+        self.path = path
+        self.pages = {}
+        with gzip.open(path, "rb") as file:
+            while True:
+                header = {}
+                line = file.readline()
+                if not line:
+                    break
+                while line.strip():
+                    key, _, value = line.decode("utf-8").partition(": ")
+                    header[key] = value.strip()
+                    line = file.readline()
+                body = file.read(int(header["Content-Length"]))
+                file.read(2)
+                self.pages[header["URL"]] = body
+
+    def __repr__(self):
+        output = "PAGE ARCHIVE: {0}\n  {1} PAGES, {2} BYTES"
+        return output.format(self.path, len(self.pages), sum(len(body) for body in self.pages.values()))
+
+    def __len__(self):
+        return len(self.pages)
+
+    def __contains__(self, url):
+        return url in self.pages
+
+    def items(self):
+        return self.pages.items()
+
+    def fetch(self, url):
+        try:
+            return self.pages[url]
+        except KeyError:
+            raise ArchiveMiss(url)
@@ -0,0 +1,208 @@
+### Description: a persistent on-disk cache for the pages downloaded from serebii.net, so that
+### re-running the scraper (e.g. after fixing a parser bug) does not have to download every page
+### again.  Page bodies are stored by the SHA-1 of their content, and a small JSON index entry per
+### URL records which body it maps to along with the ETag/Last-Modified headers used to revalidate.
+
+import hashlib
+import json
+import os
+import threading
+import time
+
+
+### Raised when the cache is in offline mode and a requested URL has never been downloaded
+class CacheMiss(Exception):
+    pass
+
+
+class ResponseCache():
+
+    ## max_bytes bounds the total size of the stored bodies; the least recently used entries are
+    ## evicted once it is exceeded.  Entries younger than max_age seconds are served without any
+    ## network traffic, older ones are revalidated with a conditional request.  In offline mode
+    ## the network is never touched.
+    def __init__(self, directory, max_bytes=500*1024*1024, max_age=30*24*60*60, offline=False):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self.offline = offline
+        self.index_dir = os.path.join(directory, "index")
+        self.body_dir = os.path.join(directory, "bodies")
+        os.makedirs(self.index_dir, exist_ok=True)
+        os.makedirs(self.body_dir, exist_ok=True)
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.revalidated = 0
+        self.misses = 0
+
+        ## Build the in-memory bookkeeping: which index entries reference each body, and the
+        ## total size of the bodies on disk
+        self.body_refs = {}
+        self.total_bytes = 0
+        for entry_name in os.listdir(self.index_dir):
+            entry = self._read_json(os.path.join(self.index_dir, entry_name))
+            if entry:
+                self.body_refs.setdefault(entry["digest"], set()).add(entry_name)
+        for digest in self.body_refs:
+            body_path = self._body_path(digest)
+            if os.path.exists(body_path):
+                self.total_bytes += os.path.getsize(body_path)
+
+    def __repr__(self):
+        output = "RESPONSE CACHE: {0}\n  {1} URLS, {2} BYTES\n  {3} HITS, {4} REVALIDATED, {5} MISSES"
+        return output.format(self.directory, sum(len(refs) for refs in self.body_refs.values()),
+                             self.total_bytes, self.hits, self.revalidated, self.misses)
+
+    def _entry_name(self, url):
+        return hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json"
+
+    def _body_path(self, digest):
+        return os.path.join(self.body_dir, digest[:2], digest)
+
+    @staticmethod
+    def _read_json(path):
+        try:
+            with open(path, "r") as file:
+                return json.load(file)
+        except (OSError, ValueError):
+            return None
+
+    ## Writes go to a temporary file first, so that a crash never leaves a half-written entry
+    @staticmethod
+    def _write_atomic(path, data):
+        temp_path = "{0}.{1}.tmp".format(path, threading.get_ident())
+        with open(temp_path, "wb") as file:
+            file.write(data)
+        os.replace(temp_path, path)
+
+    ## Returns the index entry for the url (or None), marking it as recently used.  Another thread
+    ## may be evicting the entry at the same time, so a file that has gone missing is a miss.
+    def lookup(self, url):
+        entry_path = os.path.join(self.index_dir, self._entry_name(url))
+        entry = self._read_json(entry_path)
+        if entry is None:
+            return None
+        with self.lock:
+            if not os.path.exists(self._body_path(entry["digest"])):
+                return None
+            try:
+                os.utime(entry_path)
+            except FileNotFoundError:
+                return None
+        return entry
+
+    ## Counters are shared by all the crawler threads, so they are only changed under the lock
+    def _count(self, counter):
+        with self.lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
+    ## Yields the index entry of every cached url, in a stable (index file name) order
+    def entries(self):
+        for entry_name in sorted(os.listdir(self.index_dir)):
+            entry = self._read_json(os.path.join(self.index_dir, entry_name))
+            if entry:
+                yield entry
+
+    def read_body(self, entry):
+        with open(self._body_path(entry["digest"]), "rb") as file:
+            return file.read()
+
+    ## Stores a freshly downloaded body under the url, then evicts old entries if needed
+    def store(self, url, body, headers):
+        digest = hashlib.sha1(body).hexdigest()
+        entry_name = self._entry_name(url)
+        entry = {"url":url, "digest":digest, "etag":headers.get("ETag"),
+                 "last_modified":headers.get("Last-Modified"), "fetched":time.time()}
+        with self.lock:
+            body_path = self._body_path(digest)
+            if not os.path.exists(body_path):
+                os.makedirs(os.path.dirname(body_path), exist_ok=True)
+                self._write_atomic(body_path, body)
+                self.total_bytes += len(body)
+            old_entry = self._read_json(os.path.join(self.index_dir, entry_name))
+            if old_entry and not old_entry["digest"] == digest:
+                self._release_body(old_entry["digest"], entry_name)
+            self.body_refs.setdefault(digest, set()).add(entry_name)
+            self._write_atomic(os.path.join(self.index_dir, entry_name), json.dumps(entry).encode("utf-8"))
+            self._evict()
+        return entry
+
+    ## Records that a 304 confirmed the stored body is still current
+    def touch(self, entry):
+        entry["fetched"] = time.time()
+        entry_path = os.path.join(self.index_dir, self._entry_name(entry["url"]))
+        with self.lock:
+            ## An entry evicted in the meantime is not brought back
+            if os.path.exists(entry_path):
+                self._write_atomic(entry_path, json.dumps(entry).encode("utf-8"))
+
+    def _release_body(self, digest, entry_name):
+        refs = self.body_refs.get(digest, set())
+        refs.discard(entry_name)
+        if not refs:
+            self.body_refs.pop(digest, None)
+            body_path = self._body_path(digest)
+            if os.path.exists(body_path):
+                self.total_bytes -= os.path.getsize(body_path)
+                os.remove(body_path)
+
+    ## Removes least recently used index entries (and bodies nobody references any more) until the
+    ## cache fits in max_bytes.  Must be called with the lock held.
+    def _evict(self):
+        if self.total_bytes <= self.max_bytes:
+            return
+        entries = []
+        for entry_name in os.listdir(self.index_dir):
+            if entry_name.endswith(".json"):
+                entry_path = os.path.join(self.index_dir, entry_name)
+                entries.append((os.path.getmtime(entry_path), entry_name))
+        entries.sort()
+        for _, entry_name in entries:
+            if self.total_bytes <= self.max_bytes:
+                break
+            entry_path = os.path.join(self.index_dir, entry_name)
+            entry = self._read_json(entry_path)
+            os.remove(entry_path)
+            if entry:
+                self._release_body(entry["digest"], entry_name)
+
+    ## Returns the body for the url.  download(url, headers) must return (status, headers, body)
+    ## and is only called on a miss or when a stale entry needs revalidating; a 304 status means
+    ## the stored body is still valid.  max_age overrides the cache-wide setting for this request.
+    def fetch(self, url, download, max_age=None):
+        if max_age is None:
+            max_age = self.max_age
+        entry = self.lookup(url)
+        ## The body can still be evicted after the lookup; it is then downloaded again in full
+        if entry is not None:
+            if self.offline or time.time() - entry["fetched"] < max_age:
+                try:
+                    body = self.read_body(entry)
+                    self._count("hits")
+                    return body
+                except FileNotFoundError:
+                    pass
+            else:
+                conditional_headers = {}
+                if entry["etag"]:
+                    conditional_headers["If-None-Match"] = entry["etag"]
+                if entry["last_modified"]:
+                    conditional_headers["If-Modified-Since"] = entry["last_modified"]
+                status, headers, body = download(url, conditional_headers)
+                if not status == 304:
+                    self.store(url, body, headers)
+                    return body
+                try:
+                    body = self.read_body(entry)
+                    self._count("revalidated")
+                    self.touch(entry)
+                    return body
+                except FileNotFoundError:
+                    pass
+
+        if self.offline:
+            raise CacheMiss(url)
+        self._count("misses")
+        status, headers, body = download(url, {})
+        self.store(url, body, headers)
+        return body
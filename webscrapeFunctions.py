@@ -3,14 +3,94 @@
 ### TCG info
 
 
-from bs4 import BeautifulSoup
-import urllib.request
+from bs4 import BeautifulSoup, UnicodeDammit
+import lxml.html
 import re
 from PokemonCardClasses import *
+from webscrapeCache import ResponseCache, CacheMiss
+from webscrapeSession import Session, HTTPStatusError
+from webscrapeArchive import PageArchive, PageArchiveWriter, ArchiveMiss
+
+
+### Every page request goes through one shared Session (see webscrapeSession.py), which keeps
+### connections to serebii.net open, retries transient failures and limits the request rate.
+### get_soup() may be called from several threads at once; the session caps the number of
+### connections per host.
+SESSION = Session()
+
+### The on-disk response cache used by fetch_html(), if one has been enabled
+RESPONSE_CACHE = None
+
+### Page archives (see webscrapeArchive.py): fetched pages are appended to PAGE_RECORDER, and if
+### PAGE_REPLAY is set, every page is served from it instead of the network
+PAGE_RECORDER = None
+PAGE_REPLAY = None
+
+
+### Function description: replaces the shared session with one using the given per-host
+### connection cap, politeness delay (the minimum number of seconds between request starts, as a
+### token bucket rate) and retry settings.  Should be called before any crawling threads start.
+def configure_crawler(max_connections_per_host=4, politeness_delay=0.0, retries=4, backoff=0.5, timeout=30):
+    global SESSION
+    rate = 1.0 / politeness_delay if politeness_delay > 0 else None
+    SESSION.close()
+    SESSION = Session(max_connections_per_host, retries, backoff, timeout, rate)
+    return SESSION
+
+
+### Function description: downloads a url over the shared session and returns the status, headers
+### and body.  A 304 response to a conditional request is returned rather than raised.
+def download(url, headers=None):
+    return SESSION.get(url, headers)
+
+
+### Function description: turns on the on-disk response cache (see webscrapeCache.py) for every
+### page fetched from here on.  Passing directory=None turns it back off.
+def enable_cache(directory, max_bytes=500*1024*1024, max_age=30*24*60*60, offline=False):
+    global RESPONSE_CACHE
+    if directory is None:
+        RESPONSE_CACHE = None
+    else:
+        RESPONSE_CACHE = ResponseCache(directory, max_bytes, max_age, offline)
+    return RESPONSE_CACHE
+
+
+### Function description: starts appending every fetched page to an archive file.  Passing
+### path=None stops recording.
+def enable_recording(path):
+    global PAGE_RECORDER
+    if PAGE_RECORDER is not None:
+        PAGE_RECORDER.close()
+    PAGE_RECORDER = PageArchiveWriter(path) if path is not None else None
+    return PAGE_RECORDER
+
+
+### Function description: serves every page from a recorded archive instead of the network.
+### Passing path=None goes back to the network.
+def enable_replay(path):
+    global PAGE_REPLAY
+    PAGE_REPLAY = PageArchive(path) if path is not None else None
+    return PAGE_REPLAY
+
+
+### Function description: returns the raw HTML for a url, from the replay archive or response
+### cache if enabled.  max_age (in seconds) overrides how old a cached copy may be before it is
+### revalidated.
+def fetch_html(url, max_age=None):
+    if PAGE_REPLAY is not None:
+        return PAGE_REPLAY.fetch(url)
+    if RESPONSE_CACHE is not None:
+        html = RESPONSE_CACHE.fetch(url, download, max_age)
+    else:
+        html = download(url)[2]
+    if PAGE_RECORDER is not None:
+        PAGE_RECORDER.record(url, html)
+    return html
+
 
 ### Function description: generates the soup from a given url
-def get_soup(url):
-    html = urllib.request.urlopen(url).read()
+def get_soup(url, max_age=None):
+    html = fetch_html(url, max_age)
     soup = BeautifulSoup(html, "lxml")
     return soup
 
@@ -24,10 +104,29 @@ def energy_as_strings(rows, energy_dict):
     return energy
 
 
+### Matches an HTML tag; for <img> tags, group 1 is the image source
+HTML_TAG = re.compile(r'<img\b[^>]*?\bsrc="([^"]*)"[^>]*>|<[^>]*>')
+
+### The attack/ability name that precedes the description in an attack or ability cell
+ATTACK_NAME_PREFIX = re.compile(".*?br/>")
+ABILITY_NAME_PREFIX = re.compile(".*br/>")
+
+
+### Function description: converts an HTML fragment of card text into plain text in a single pass,
+### replacing each energy image with its string equivalent from energy_dict and dropping every
+### other tag.
+def html_to_card_text(fragment, energy_dict):
+    def replace_tag(match):
+        if match.group(1) is None:
+            return ""
+        return energy_dict[match.group(1).lower()]
+    return HTML_TAG.sub(replace_tag, fragment)
+
+
 ### Function description: Takes the urls for the english set and promo lists, and returns the
 ### links and names for each individual set/promotional set
-def get_expansion_links(BASE_URL, section_url):
-    soup = get_soup(section_url)
+def get_expansion_links(BASE_URL, section_url, max_age=None):
+    soup = get_soup(section_url, max_age)
     target_table = soup.find("table", attrs={"width":"100% border="})
     rows = target_table.find_all("tr")
     expansion_list = []
@@ -42,8 +141,13 @@ def get_expansion_links(BASE_URL, section_url):
 ### Function description: Serebii's card pages have card "types" listed (e.g., "Trainer" or a
 ### particular species of Pokemon).  This function extracts those types, if available.
 def get_card_type(card_url):
+    return extract_card_type(get_soup(card_url))
+
+
+### Function description: the parsing half of get_card_type(), for a card page that has already
+### been turned into soup.
+def extract_card_type(soup):
     card_type_list = []
-    soup = get_soup(card_url)
     type_links = soup.find("td", attrs = {"width":"160"})
     if not type_links:
         type_links = soup.find("td", attrs = {"width":"125"})
@@ -84,12 +188,95 @@ def get_card_links(expansion_url, base_url):
 ### Function description: The HTML for the cards is organized in a <table> element, with the
 ### various rows containing the data.  This function extracts all of the rows of that table.
 def get_card_rows(card_url):
-    soup = get_soup(card_url)
+    return extract_card_rows(get_soup(card_url))
+
+
+### Function description: the parsing half of get_card_rows(), for a card page that has already
+### been turned into soup.
+def extract_card_rows(soup):
     target_table = soup.find("table", attrs={"width":"100%","border":"0","cellspacing":"0","cellpadding":"5"})
     target_rows = target_table.find_all("tr")[1:]
     return target_rows
 
 
+### Function description: Downloads and parses a card page once, returning both the card types
+### (as get_card_type() would) and the data rows (as get_card_rows() would) from the same soup.
+def get_card_page(card_url):
+    return parse_card_page(fetch_html(card_url))
+
+
+### Function description: the parsing half of get_card_page(), for raw HTML that has already been
+### downloaded (e.g. by a separate fetching stage).  backend picks one of PARSER_BACKENDS and
+### defaults to PARSER_BACKEND.
+def parse_card_page(html, backend=None):
+    soup = PARSER_BACKENDS[backend or PARSER_BACKEND](html)
+    return extract_card_type(soup), extract_card_rows(soup)
+
+
+### Function description: "full" parser backend - builds the BeautifulSoup tree for the whole page
+def full_card_soup(html):
+    return BeautifulSoup(html, "lxml")
+
+
+### Function description: "lxml" parser backend - parses the page with lxml alone, uses XPath to
+### find the type cell and the card table that extract_card_type() and extract_card_rows() look
+### for, and only builds BeautifulSoup trees for those two subtrees.
+def targeted_card_soup(html):
+    if isinstance(html, bytes):
+        html = UnicodeDammit(html, is_html=True).unicode_markup
+    root = lxml.html.fromstring(html)
+    fragments = []
+    for xpath in CARD_TYPE_XPATHS:
+        type_cells = root.xpath(xpath)
+        if type_cells:
+            fragments.append(lxml.html.tostring(type_cells[0], encoding="unicode", with_tail=False))
+            break
+    card_tables = root.xpath(CARD_TABLE_XPATH)
+    if card_tables:
+        fragments.append(lxml.html.tostring(card_tables[0], encoding="unicode", with_tail=False))
+    return BeautifulSoup("".join(fragments), "lxml")
+
+
+### XPath equivalents of the searches done by extract_card_type() and extract_card_rows()
+CARD_TYPE_XPATHS = ('//td[@width="160"]', '//td[@width="125"]')
+CARD_TABLE_XPATH = '//table[@width="100%"][@border="0"][@cellspacing="0"][@cellpadding="5"]'
+
+PARSER_BACKENDS = {"full":full_card_soup, "lxml":targeted_card_soup}
+PARSER_BACKEND = "full"
+
+### Version of the cards the parser produces.  Bump it whenever a parser fix changes the cards, so
+### that cards checkpointed by the old parser (see scrapeCheckpoint.py) are ripped again.
+CARD_FORMAT_VERSION = 1
+
+
+### Function description: uses the card types to figure out whether the rows are for a Trainer,
+### Energy, or Pokemon card, and returns the populated card object.
+def build_card(card_types, card_rows, energy_dict, pokemon_species):
+    if not card_types:
+        card = get_trainer(card_rows, energy_dict)
+        card.subtype = ["Trainer"]
+    elif card_types[0] in pokemon_species:
+        card = get_pokemon(card_rows, energy_dict, card_types)
+    elif card_types[0] == "Energy":
+        card = get_energy(card_rows, energy_dict)
+    else:
+        card = get_trainer(card_rows, energy_dict)
+        card.subtype = card_types
+    return card
+
+
+### Function description: rips a single card from its page, fetching and parsing the page once
+def get_card(card_url, energy_dict, pokemon_species):
+    card_types, card_rows = get_card_page(card_url)
+    return build_card(card_types, card_rows, energy_dict, pokemon_species)
+
+
+### Function description: builds the card object straight from a card page's raw HTML
+def card_from_html(html, energy_dict, pokemon_species, backend=None):
+    card_types, card_rows = parse_card_page(html, backend)
+    return build_card(card_types, card_rows, energy_dict, pokemon_species)
+
+
 ### Function description: Processes the output of get_rows() and extracts the information to
 ### populate an EnergyCard() object.
 def get_energy(energy_rows, energy_dict):
@@ -103,15 +290,7 @@ def get_energy(energy_rows, energy_dict):
     if not energy_rows[1].i.get_text() == "":
         energy_card.basic = False
     
-    energy = energy_as_strings(energy_rows[3], energy_dict)
-    
-    description_text = str(energy_rows[3].p)
-    for n in range(len(energy)):
-        description_text = re.sub("<img.*?>", energy[n], description_text, count = 1)
-    
-    description_text = re.sub("<.*?>", "", description_text)
-    
-    energy_card.description = description_text
+    energy_card.description = html_to_card_text(str(energy_rows[3].p), energy_dict)
     
     return energy_card
 
@@ -124,12 +303,7 @@ def get_trainer(trainer_rows, energy_dict):
     
     trainer_card.name = trainer_rows[1].td.get_text().strip()
     
-    energy = energy_as_strings(trainer_rows[3], energy_dict)
-    description_text = str(trainer_rows[3].p)
-    for n in range(len(energy)):
-        description_text = re.sub("<img.*?>", energy[n], description_text, count = 1)
-    
-    description_text = re.sub("<.*?>", "", description_text).strip()
+    description_text = html_to_card_text(str(trainer_rows[3].p), energy_dict).strip()
     
     trainer_card.description = description_text
     
@@ -252,13 +426,8 @@ def get_attack(attack_row, energy_dict):
     ## From the next <td>, get the attack name and (if present) description
     attack.attack_name = attack_row[1].b.get_text().strip()
     if not attack.attack_name == attack_row[1].get_text().strip():
-        description_text = str(attack_row[1])
-        energy = energy_as_strings(attack_row[1], energy_dict)
-        description_text = re.sub(".*?br/>", "", description_text, count = 1)
-        for n in range(len(energy)):
-            description_text = re.sub("<img.*?>", energy[n], description_text, count = 1)
-        description_text = re.sub("<.*?>", "", description_text).strip()
-        attack.description = description_text
+        description_text = ATTACK_NAME_PREFIX.sub("", str(attack_row[1]), count = 1)
+        attack.description = html_to_card_text(description_text, energy_dict).strip()
     
     ## From the last element, get the attack's base damage, if present
     attack.base_damage = attack_row[2].get_text().strip()
@@ -274,17 +443,10 @@ def get_ability(ability_row, energy_dict):
     ## Since abilities/powers/bodies come in a couple different 
     if ability_row[0].img or ability_row[0].get_text().strip()[0] == "P":
         ability_name = ability_row[1].b.get_text().strip()
-        ability_description = str(ability_row[1].font)
-        ability_description = re.sub(".*br/>|<i>|</i>","", ability_description)[:-7].strip()
+        ability_description = ABILITY_NAME_PREFIX.sub("", str(ability_row[1].font))[:-7]
+        ability_description = html_to_card_text(ability_description, energy_dict).strip()
     else:
         ability_name = ability_row[0].get_text().strip()
-        ability_description = str(ability_row[1])[19:-6]
-        ability_description = re.sub("<i>|</i>", "", ability_description)
-    
-    ## If there are any energy images present 
-    ability_energy = energy_as_strings(ability_row[1], energy_dict)
-    if ability_energy:
-        for n in range(len(ability_energy)):
-            ability_description = re.sub("<.*?>", ability_energy[n], ability_description, count = 1)
+        ability_description = html_to_card_text(str(ability_row[1])[19:-6], energy_dict)
     
     return {ability_name:ability_description}
\ No newline at end of file
@@ -0,0 +1,176 @@
+### Description: a small HTTP client shared by all of the scraping code.  It keeps connections to
+### each host open between requests (keep-alive) instead of reconnecting for every page, retries
+### timeouts, dropped connections and 5xx responses with exponential backoff, limits the overall
+### request rate with a token bucket, and records how long every request took.
+
+import http.client
+import random
+import socket
+import threading
+import time
+import urllib.parse
+
+
+### Raised for responses that are still errors after all retries (or are not worth retrying)
+class HTTPStatusError(Exception):
+
+    def __init__(self, url, status, reason=""):
+        Exception.__init__(self, "{0} {1} for {2}".format(status, reason, url))
+        self.url = url
+        self.status = status
+        self.reason = reason
+
+
+### Classic token bucket: tokens refill at `rate` per second up to `capacity`, and each request
+### takes one token, waiting for it if the bucket is empty.  A rate of None means no limit.
+class TokenBucket():
+
+    def __init__(self, rate, capacity=1):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.last_refill = time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        if not self.rate:
+            return
+        with self.lock:
+            now = time.monotonic()
+            self.tokens = min(self.capacity, self.tokens + (now - self.last_refill) * self.rate)
+            self.last_refill = now
+            self.tokens -= 1
+            wait = -self.tokens / self.rate if self.tokens < 0 else 0
+        if wait > 0:
+            time.sleep(wait)
+
+
+class Session():
+
+    RETRY_STATUSES = (500, 502, 503, 504)
+    REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+    CONNECTION_ERRORS = (http.client.HTTPException, ConnectionError, socket.timeout, OSError)
+
+    def __init__(self, max_connections_per_host=4, retries=4, backoff=0.5, timeout=30,
+                 rate=None, burst=1, max_redirects=5):
+        self.max_connections_per_host = max(1, int(max_connections_per_host))
+        self.retries = retries
+        self.backoff = backoff
+        self.timeout = timeout
+        self.max_redirects = max_redirects
+        self.rate_limiter = TokenBucket(rate, burst)
+        self.lock = threading.Lock()
+        self.idle_connections = {}
+        self.host_slots = {}
+        self.latencies = []
+
+    ## Returns an idle keep-alive connection to the host if there is one, otherwise a new one.
+    ## The caller must already hold one of the host's slots.
+    def _get_connection(self, host_key):
+        with self.lock:
+            idle = self.idle_connections.get(host_key)
+            if idle:
+                return idle.pop()
+        scheme, netloc = host_key
+        if scheme == "https":
+            return http.client.HTTPSConnection(netloc, timeout=self.timeout)
+        return http.client.HTTPConnection(netloc, timeout=self.timeout)
+
+    def _release_connection(self, host_key, connection):
+        with self.lock:
+            self.idle_connections.setdefault(host_key, []).append(connection)
+
+    def _host_slot(self, host_key):
+        with self.lock:
+            slot = self.host_slots.get(host_key)
+            if slot is None:
+                slot = threading.BoundedSemaphore(self.max_connections_per_host)
+                self.host_slots[host_key] = slot
+        return slot
+
+    ## Sends one request over a pooled connection and records its latency; returns (status,
+    ## headers, body).  Connections are only put back in the pool once the response has been read
+    ## completely.
+    def _send(self, url, headers):
+        parts = urllib.parse.urlsplit(url)
+        host_key = (parts.scheme, parts.netloc)
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        slot = self._host_slot(host_key)
+        slot.acquire()
+        try:
+            connection = self._get_connection(host_key)
+            start_time = time.monotonic()
+            try:
+                connection.request("GET", path, headers=headers)
+                response = connection.getresponse()
+                body = response.read()
+            except self.CONNECTION_ERRORS:
+                connection.close()
+                self._record(url, None, start_time)
+                raise
+            self._record(url, response.status, start_time)
+            if response.will_close:
+                connection.close()
+            else:
+                self._release_connection(host_key, connection)
+            return response.status, response.headers, body
+        finally:
+            slot.release()
+
+    ## Function description: GETs a url and returns (status, headers, body), following redirects
+    ## and retrying transient failures.  A 304 is returned to the caller; other 4xx responses and
+    ## 5xx responses that outlive the retries raise HTTPStatusError.
+    def get(self, url, headers=None):
+        headers = dict(headers or {})
+        redirects = 0
+        attempt = 0
+        while True:
+            self.rate_limiter.acquire()
+            try:
+                status, response_headers, body = self._send(url, headers)
+            except self.CONNECTION_ERRORS:
+                if attempt >= self.retries:
+                    raise
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+
+            if status in self.REDIRECT_STATUSES and response_headers.get("Location") and redirects < self.max_redirects:
+                url = urllib.parse.urljoin(url, response_headers["Location"])
+                redirects += 1
+                continue
+            if status in self.RETRY_STATUSES and attempt < self.retries:
+                self._sleep_before_retry(attempt)
+                attempt += 1
+                continue
+            if status >= 400:
+                raise HTTPStatusError(url, status, http.client.responses.get(status, ""))
+            return status, response_headers, body
+
+    def _sleep_before_retry(self, attempt):
+        delay = self.backoff * (2 ** attempt)
+        time.sleep(delay + random.uniform(0, delay / 2))
+
+    def _record(self, url, status, start_time):
+        with self.lock:
+            self.latencies.append((url, status, time.monotonic() - start_time))
+
+    ## Function description: summarizes the recorded request latencies (in seconds)
+    def latency_report(self):
+        with self.lock:
+            times = sorted(latency for _, _, latency in self.latencies)
+            failures = sum(1 for _, status, _ in self.latencies if status is None or status >= 500)
+        if not times:
+            return {"requests":0, "failures":0}
+        return {"requests":len(times), "failures":failures,
+                "mean":sum(times) / len(times), "p50":times[len(times) // 2],
+                "p95":times[min(len(times) - 1, int(len(times) * 0.95))], "max":times[-1]}
+
+    def close(self):
+        with self.lock:
+            for connections in self.idle_connections.values():
+                for connection in connections:
+                    connection.close()
+            self.idle_connections = {}